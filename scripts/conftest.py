@@ -0,0 +1,14 @@
+import pytest
+
+from src.services.commit_service import CommitService
+from src.services.restore_service import RestoreService
+from src.stand_in.server import StandInServer
+
+
+@pytest.fixture(scope='function')
+def stand_in_server(monkeypatch):
+    # Points both services at a local stand-in so no FileVersionControl project is needed
+    with StandInServer() as server:
+        monkeypatch.setattr(CommitService, "url", f"{server.base_url}/api/v1/commit")
+        monkeypatch.setattr(RestoreService, "url", f"{server.base_url}/api/v1/restore")
+        yield server
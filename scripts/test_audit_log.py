@@ -0,0 +1,137 @@
+import struct
+from http import HTTPStatus
+
+import pytest
+
+from src.models.audit_log import AuditLog, Kind, Outcome, parse_result
+from src.models.response import Response
+
+
+def commit_response(failed_files: list[str]) -> Response:
+    results = [f"{name} has not been committed\n" for name in failed_files]
+    results += [f"{name} has been committed\n" for name in ["test_file1.txt", "test_file2.txt", "test_file3.txt"]
+                if name not in failed_files]
+    if failed_files:
+        return Response(status=HTTPStatus.INTERNAL_SERVER_ERROR.value, results=results,
+                        message="Not all files have been committed")
+    return Response(status=HTTPStatus.CREATED.value, results=results, message="All files have been committed")
+
+
+@pytest.fixture(scope='function')
+def audit_log_path(tmp_path):
+    return str(tmp_path / "audit.log")
+
+
+@pytest.mark.parametrize("result, expected", [
+    ("test_file1.txt has been committed\n", ("test_file1.txt", Outcome.COMMITTED)),
+    ("test_file3.txt has not been restored\n", ("test_file3.txt", Outcome.NOT_RESTORED)),
+    ("test_file2.txt is already up to date\n", ("test_file2.txt", Outcome.ALREADY_UP_TO_DATE)),
+    ("/tmp/directory is up to date", ("/tmp/directory", Outcome.UP_TO_DATE)),
+    ("The request body is not valid JSON", ("The request body is not valid JSON", Outcome.OTHER))
+])
+def test_parse_result(result, expected):
+    assert parse_result(result) == expected
+
+
+def test_responses_round_trip_through_reopened_log(audit_log_path):
+    responses = [
+        commit_response([]),
+        commit_response(["test_file3.txt"]),
+        Response(status=HTTPStatus.BAD_REQUEST.value, results=["/tmp/invalid_directory is not a directory"],
+                 message="The requested directory is not valid")
+    ]
+    with AuditLog(audit_log_path) as audit_log:
+        for response in responses:
+            audit_log.append(response)
+
+    with AuditLog(audit_log_path) as audit_log:
+        assert len(audit_log) == 3
+        for index, response in enumerate(responses):
+            assert audit_log[index].status == response.status
+            assert audit_log[index].results == response.results
+            assert audit_log[index].message == response.message
+
+
+def test_failures_for_file_in_last_commits(audit_log_path):
+    with AuditLog(audit_log_path) as audit_log:
+        for index in range(10):
+            audit_log.append(commit_response(["test_file3.txt"] if index in (1, 6, 8) else []), timestamp=index)
+            audit_log.append(Response(status=HTTPStatus.INTERNAL_SERVER_ERROR.value,
+                                      results=["test_file3.txt has not been restored\n"],
+                                      message="Not all files have been restored"), kind=Kind.RESTORE)
+
+        assert len(audit_log.failures("test_file3.txt")) == 3
+        assert [audit_log.timestamp(index) for index in audit_log.query("test_file3.txt", {Outcome.NOT_COMMITTED},
+                                                                        Kind.COMMIT, last=4)] == [6, 8]
+        assert audit_log.failures("test_file3.txt", last=1) == []
+        assert len(audit_log.failures("test_file3.txt", kind=Kind.RESTORE, last=5)) == 5
+        assert audit_log.failures("test_file1.txt") == []
+        assert audit_log.failures("missing_file.txt") == []
+        assert len(audit_log.query("test_file1.txt", kind=Kind.COMMIT, last=3)) == 3
+        assert len(audit_log.query("test_file1.txt", last=3)) == 1
+
+
+def test_log_is_compact(audit_log_path):
+    with AuditLog(audit_log_path) as audit_log:
+        for _ in range(1000):
+            audit_log.append(commit_response([]))
+
+    with open(audit_log_path, 'rb') as audit_log_file:
+        size = len(audit_log_file.read())
+    # Twenty bytes of header and five bytes per result line, plus the interned strings once
+    assert size < 1000 * (20 + 3 * 5) + 200
+
+
+def test_interrupted_append_is_discarded(audit_log_path):
+    with AuditLog(audit_log_path) as audit_log:
+        audit_log.append(commit_response([]))
+        audit_log.append(commit_response(["test_file2.txt"]))
+
+    with open(audit_log_path, 'r+b') as audit_log_file:
+        audit_log_file.truncate(len(audit_log_file.read()) - 3)
+
+    with AuditLog(audit_log_path) as audit_log:
+        assert len(audit_log) == 1
+        audit_log.append(commit_response(["test_file1.txt"]))
+        assert audit_log.failures("test_file1.txt")[0].message == "Not all files have been committed"
+
+    with AuditLog(audit_log_path) as audit_log:
+        assert len(audit_log) == 2
+
+
+def test_failed_append_leaves_log_consistent(audit_log_path):
+    with AuditLog(audit_log_path) as audit_log:
+        # The status does not fit the record, so nothing of this append may be kept
+        with pytest.raises(struct.error):
+            audit_log.append(Response(status=70000, results=["new_file.txt has been committed\n"],
+                                      message="A message that is never stored"))
+        audit_log.append(commit_response(["test_file1.txt"]))
+        assert len(audit_log) == 1
+
+    with AuditLog(audit_log_path) as audit_log:
+        assert len(audit_log) == 1
+        assert audit_log[0].message == "Not all files have been committed"
+        assert sorted(audit_log[0].results) == sorted(commit_response(["test_file1.txt"]).results)
+        assert audit_log.query("new_file.txt") == []
+
+
+def test_read_only_log_does_not_cut_off_record_being_written(audit_log_path, tmp_path):
+    with AuditLog(audit_log_path) as audit_log:
+        audit_log.append(commit_response([]))
+        audit_log.append(commit_response(["test_file2.txt"]))
+    # The writer has only written part of its next record so far
+    with open(audit_log_path, 'ab') as audit_log_file:
+        audit_log_file.write(b'R\x00')
+    with open(audit_log_path, 'rb') as audit_log_file:
+        contents = audit_log_file.read()
+
+    with AuditLog(audit_log_path, read_only=True) as audit_log:
+        assert len(audit_log) == 2
+        assert audit_log.failures("test_file2.txt")[0].message == "Not all files have been committed"
+        with pytest.raises(ValueError):
+            audit_log.append(commit_response([]))
+
+    with open(audit_log_path, 'rb') as audit_log_file:
+        assert audit_log_file.read() == contents
+    with pytest.raises(FileNotFoundError):
+        AuditLog(str(tmp_path / "missing.log"), read_only=True)
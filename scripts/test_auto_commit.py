@@ -0,0 +1,181 @@
+import json
+import sys
+import time
+from http import HTTPStatus
+from pathlib import Path
+
+import pytest
+
+from src.services.auto_commit import AutoCommitDaemon, InotifyWatcher
+from src.services.commit_service import CommitService
+from src.stand_in.faults import FaultProfile
+from src.stand_in.server import version_files
+
+pytestmark = pytest.mark.skipif(not sys.platform.startswith('linux'), reason="inotify is only available on Linux")
+
+
+def create_directory(directory: Path) -> Path:
+    nested_directory = directory / "temp"
+    nested_directory.mkdir(parents=True)
+    (directory / "test_file1.txt").write_text("This is a test file")
+    (nested_directory / "test_file2.txt").write_text("This is a second test file")
+    assert CommitService.commit(json.dumps({'directoryPath': str(directory)})).status_code == HTTPStatus.CREATED.value
+    return directory
+
+
+def wait_for(condition, timeout: float = 5.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        time.sleep(0.02)
+    return condition()
+
+
+def test_burst_of_events_is_committed_once(tmp_path, stand_in_server):
+    directory = create_directory(tmp_path / "watched")
+
+    with AutoCommitDaemon([str(directory)], debounce=0.2) as daemon:
+        for index in range(20):
+            (directory / "temp" / f"burst_file{index}.txt").write_text(f"This is burst file {index}")
+        assert wait_for(lambda: daemon.commits == 1)
+
+        # The commit writes into ".vc", which must not trigger another commit
+        time.sleep(0.5)
+        report = daemon.report()
+
+    assert report['commits'] == 1
+    assert report['commits_avoided'] == report['events'] - 1 > 0
+    assert report['statuses'] == {HTTPStatus.CREATED.value: 1}
+    assert report['latency_max'] >= 0.2
+    assert (directory / ".vc" / "2" / "temp" / "burst_file19.txt").exists()
+    assert not (directory / ".vc" / "3").exists()
+
+
+def test_idle_directories_are_not_committed(tmp_path, stand_in_server):
+    directories = [create_directory(tmp_path / f"watched{index}") for index in range(3)]
+    stand_in_server.stats.clear()
+
+    with AutoCommitDaemon([str(directory) for directory in directories], debounce=0.1) as daemon:
+        (directories[1] / "test_file1.txt").write_text("This is a changed file")
+        assert wait_for(lambda: daemon.commits == 1)
+        time.sleep(0.3)
+
+    assert daemon.commits == 1
+    assert stand_in_server.stats['commits'] == 1
+    assert (directories[1] / ".vc" / "2").exists()
+    assert not (directories[0] / ".vc" / "2").exists() and not (directories[2] / ".vc" / "2").exists()
+
+
+def test_concurrent_commits_are_bounded(tmp_path, stand_in_server):
+    directories = [create_directory(tmp_path / f"watched{index}") for index in range(4)]
+
+    with AutoCommitDaemon([str(directory) for directory in directories], debounce=0.1,
+                          max_concurrent_commits=1) as daemon:
+        for directory in directories:
+            (directory / "test_file1.txt").write_text("This is a changed file")
+        assert wait_for(lambda: daemon.commits == 4)
+
+    assert daemon.peak_in_flight == 1
+
+
+def test_new_subdirectory_is_watched_and_delta_commit_is_sent(tmp_path, stand_in_server):
+    directory = create_directory(tmp_path / "watched")
+
+    with AutoCommitDaemon([str(directory)], debounce=0.2, use_delta=True) as daemon:
+        (directory / "new_directory").mkdir()
+        assert wait_for(lambda: daemon.commits == 1)
+
+        stand_in_server.stats.clear()
+        (directory / "new_directory" / "test_file3.txt").write_text("This is a third test file")
+        (directory / "test_file1.txt").unlink()
+        assert wait_for(lambda: daemon.commits == 2)
+
+    # An empty directory has no files to commit, so only the second batch creates a version
+    assert daemon.report()['statuses'] == {HTTPStatus.CONFLICT.value: 1, HTTPStatus.CREATED.value: 1}
+    assert stand_in_server.stats['files_read'] == 1
+    assert (directory / ".vc" / "2" / "new_directory" / "test_file3.txt").exists()
+    assert not (directory / ".vc" / "2" / "test_file1.txt").exists()
+
+
+def test_failed_delta_commit_is_retried_with_next_batch(tmp_path, stand_in_server):
+    directory = create_directory(tmp_path / "watched")
+    stand_in_server.faults = FaultProfile(error_rate=1.0)
+
+    with AutoCommitDaemon([str(directory)], debounce=0.2, use_delta=True, retry_backoff=0.1,
+                          max_retry_backoff=0.2) as daemon:
+        (directory / "test_file1.txt").write_text("This is a changed file")
+        assert wait_for(lambda: daemon.report()['statuses'].get(HTTPStatus.INTERNAL_SERVER_ERROR.value, 0) >= 1)
+
+        stand_in_server.faults = FaultProfile()
+        (directory / "temp" / "test_file2.txt").write_text("This is a second changed file")
+        assert wait_for(lambda: daemon.report()['statuses'].get(HTTPStatus.CREATED.value) == 1)
+        report = daemon.report()
+
+    committed = version_files(str(directory / ".vc" / "2"))
+    assert Path(committed["test_file1.txt"]).read_text() == "This is a changed file"
+    assert CommitService.commit(json.dumps({'directoryPath': str(directory)})).status_code == \
+        HTTPStatus.CONFLICT.value
+    # Only the successful commit counts towards the latency and commits avoided
+    assert report['latency_max'] is not None and report['latency_p50'] == report['latency_max']
+    assert report['commits_avoided'] == report['events'] - 1
+
+
+def test_failed_commits_back_off(tmp_path, stand_in_server):
+    directory = create_directory(tmp_path / "watched")
+    stand_in_server.faults = FaultProfile(error_rate=1.0)
+
+    with AutoCommitDaemon([str(directory)], debounce=0.05, max_delay=0.1, retry_backoff=0.1,
+                          max_retry_backoff=0.4) as daemon:
+        (directory / "test_file1.txt").write_text("This is a changed file")
+        assert wait_for(lambda: daemon.commits >= 3)
+        time.sleep(1.0)
+
+    # Retries wait 0.1, 0.2 and then 0.4 seconds, instead of following each other once max_delay has passed
+    injected_errors = stand_in_server.stats['injected_errors']
+    assert 3 <= injected_errors <= 8
+    assert daemon.report()['statuses'] == {HTTPStatus.INTERNAL_SERVER_ERROR.value: injected_errors}
+
+
+def test_rejected_delta_commit_is_sent_in_full(tmp_path, stand_in_server, monkeypatch):
+    directory = create_directory(tmp_path / "watched")
+    commit_delta = CommitService.commit_delta
+
+    def commit_delta_with_missing_file(directory_path, changed=None, added=None, renamed=None, removed=None):
+        # The file disappears between the event and the request, so the server rejects the delta
+        return commit_delta(directory_path, changed=changed + ["missing_file.txt"], added=added, renamed=renamed,
+                            removed=removed)
+
+    monkeypatch.setattr(CommitService, "commit_delta", staticmethod(commit_delta_with_missing_file))
+
+    with AutoCommitDaemon([str(directory)], debounce=0.1, use_delta=True) as daemon:
+        (directory / "test_file1.txt").write_text("This is a changed file")
+        assert wait_for(lambda: daemon.commits == 2)
+
+    assert daemon.report()['statuses'] == {HTTPStatus.BAD_REQUEST.value: 1, HTTPStatus.CREATED.value: 1}
+    assert (directory / ".vc" / "2" / "test_file1.txt").read_text() == "This is a changed file"
+
+
+def test_waiting_for_a_free_slot_does_not_poll(tmp_path, stand_in_server, monkeypatch):
+    directories = [create_directory(tmp_path / f"watched{index}") for index in range(2)]
+    stand_in_server.faults = FaultProfile(delay=1.0)
+    waits = []
+    read_events = InotifyWatcher.read_events
+
+    def recording_read_events(self, timeout):
+        waits.append(timeout)
+        return read_events(self, timeout)
+
+    monkeypatch.setattr(InotifyWatcher, "read_events", recording_read_events)
+
+    with AutoCommitDaemon([str(directory) for directory in directories], debounce=0.05,
+                          max_concurrent_commits=1) as daemon:
+        for directory in directories:
+            (directory / "test_file1.txt").write_text("This is a changed file")
+        assert wait_for(lambda: daemon.peak_in_flight == 1)
+        time.sleep(0.2)
+        waits_while_busy = len(waits)
+        time.sleep(0.6)
+        assert len(waits) == waits_while_busy
+        assert waits[-1] is None
+        assert wait_for(lambda: daemon.commits == 2, timeout=5)
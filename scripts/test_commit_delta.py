@@ -0,0 +1,142 @@
+import json
+import os
+from http import HTTPStatus
+from pathlib import Path
+
+import pytest
+
+from src.models.response import Response
+from src.services.commit_service import CommitService
+from src.stand_in.server import version_files
+
+
+@pytest.fixture(scope='function')
+def commit_service():
+    return CommitService
+
+
+def create_tree(directory: Path, file_count: int):
+    # Spreads the files over ten nested directories
+    for index in range(file_count):
+        nested_directory = directory / f"temp{index % 10}"
+        nested_directory.mkdir(exist_ok=True)
+        (nested_directory / f"test_file{index}.txt").write_text(f"This is test file {index}")
+
+
+def to_response(response) -> Response:
+    response_dict = response.json()
+    return Response(
+        status=response_dict["status"],
+        results=response_dict["results"],
+        message=response_dict["message"]
+    )
+
+
+def test_delta_payload_lists_every_kind_of_change(commit_service):
+    data = json.loads(commit_service.delta_payload("/tmp/directory", changed=["a.txt"], added=["b.txt"],
+                                                   renamed=[("c.txt", "d.txt")], removed=["e.txt"]))
+
+    assert data == {'directoryPath': "/tmp/directory",
+                    'delta': {'changed': ["a.txt"], 'added': ["b.txt"], 'renamed': [{'from': "c.txt", 'to': "d.txt"}],
+                              'removed': ["e.txt"]}}
+
+
+def test_post_commit_delta_returns_201_and_commits_only_listed_paths(tmp_path, stand_in_server, commit_service):
+    create_tree(tmp_path, 10)
+    assert commit_service.commit(json.dumps({'directoryPath': str(tmp_path)})).status_code == HTTPStatus.CREATED.value
+
+    (tmp_path / "temp1" / "test_file1.txt").write_text("This is a changed file")
+    (tmp_path / "temp2" / "added_file.txt").write_text("This is an added file")
+    (tmp_path / "temp3" / "test_file3.txt").rename(tmp_path / "temp3" / "renamed_test_file.txt")
+    (tmp_path / "temp4" / "test_file4.txt").unlink()
+
+    response = commit_service.commit_delta(str(tmp_path), changed=["temp1/test_file1.txt"],
+                                           added=["temp2/added_file.txt"],
+                                           renamed=[("temp3/test_file3.txt", "temp3/renamed_test_file.txt")],
+                                           removed=["temp4/test_file4.txt"])
+    received_response = to_response(response)
+
+    assert response.status_code == HTTPStatus.CREATED.value
+    assert sorted(received_response.results) == sorted(["test_file1.txt has been committed\n",
+                                                        "added_file.txt has been committed\n",
+                                                        "renamed_test_file.txt has been committed\n",
+                                                        "test_file3.txt has been removed\n",
+                                                        "test_file4.txt has been removed\n"])
+    assert received_response.message == "All files have been committed"
+
+    # The new version matches the working directory even though only the delta was sent
+    committed = version_files(str(tmp_path / ".vc" / "2"))
+    working = sorted(str(path.relative_to(tmp_path)) for path in tmp_path.rglob("*")
+                     if path.is_file() and ".vc" not in path.relative_to(tmp_path).parts)
+    assert sorted(committed) == working
+    assert Path(committed[os.path.join("temp1", "test_file1.txt")]).read_text() == "This is a changed file"
+    # Only the written paths are stored in the new version, the rest comes from its parent
+    assert sorted(str(path.relative_to(tmp_path / ".vc" / "2")) for path in (tmp_path / ".vc" / "2").rglob("*")
+                  if path.is_file()) == sorted([os.path.join("temp1", "test_file1.txt"),
+                                                os.path.join("temp2", "added_file.txt"),
+                                                os.path.join("temp3", "renamed_test_file.txt")])
+    assert (tmp_path / ".vc" / "1" / "temp1" / "test_file1.txt").read_text() == "This is test file 1"
+
+    # A full commit afterwards agrees that nothing is left to commit
+    response = commit_service.commit(json.dumps({'directoryPath': str(tmp_path)}))
+    assert response.status_code == HTTPStatus.CONFLICT.value
+
+
+def test_post_commit_delta_with_missing_file_returns_400(tmp_path, stand_in_server, commit_service):
+    create_tree(tmp_path, 3)
+    commit_service.commit(json.dumps({'directoryPath': str(tmp_path)}))
+
+    response = commit_service.commit_delta(str(tmp_path), changed=["temp0/missing_file.txt"])
+    received_response = to_response(response)
+
+    assert response.status_code == HTTPStatus.BAD_REQUEST.value
+    assert received_response.results == ["temp0/missing_file.txt is not a file"]
+    assert received_response.message == "The requested delta is not valid"
+
+
+@pytest.mark.parametrize("delta", [["temp0/test_file0.txt"], {'changed': "temp0/test_file0.txt"},
+                                   {'renamed': [{'from': "temp0/test_file0.txt"}]}, {'renamed': ["temp0"]}])
+def test_post_commit_malformed_delta_returns_400(tmp_path, stand_in_server, commit_service, delta):
+    create_tree(tmp_path, 3)
+    commit_service.commit(json.dumps({'directoryPath': str(tmp_path)}))
+
+    response = commit_service.commit(json.dumps({'directoryPath': str(tmp_path), 'delta': delta}))
+
+    assert response.status_code == HTTPStatus.BAD_REQUEST.value
+    assert to_response(response).message == "The requested delta is not valid"
+    assert sorted(os.listdir(tmp_path / ".vc")) == ["1"]
+
+
+def test_post_commit_empty_delta_returns_409(tmp_path, stand_in_server, commit_service):
+    create_tree(tmp_path, 3)
+    commit_service.commit(json.dumps({'directoryPath': str(tmp_path)}))
+
+    response = commit_service.commit_delta(str(tmp_path))
+
+    assert response.status_code == HTTPStatus.CONFLICT.value
+    assert to_response(response).results == [f"{tmp_path} is up to date"]
+
+
+@pytest.mark.parametrize("file_count", [100, 400, 1600])
+def test_commit_delta_cost_follows_delta_size(tmp_path, stand_in_server, commit_service, file_count):
+    create_tree(tmp_path, file_count)
+    commit_service.commit(json.dumps({'directoryPath': str(tmp_path)}))
+
+    changed = [f"temp{index % 10}/test_file{index}.txt" for index in range(5)]
+    for path in changed:
+        (tmp_path / path).write_text("This is a changed file")
+
+    stand_in_server.stats.clear()
+    assert commit_service.commit_delta(str(tmp_path), changed=changed).status_code == HTTPStatus.CREATED.value
+    delta_reads = stand_in_server.stats['files_read']
+    delta_writes = stand_in_server.stats['files_written']
+
+    (tmp_path / changed[0]).write_text("This is a changed file again")
+    stand_in_server.stats.clear()
+    assert commit_service.commit(json.dumps({'directoryPath': str(tmp_path)})).status_code == HTTPStatus.CREATED.value
+    full_reads = stand_in_server.stats['files_read']
+    full_writes = stand_in_server.stats['files_written']
+
+    # The delta commit touches the same number of files whatever the size of the tree
+    assert delta_reads == delta_writes == len(changed)
+    assert full_reads >= file_count and full_writes == file_count
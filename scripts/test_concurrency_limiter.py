@@ -0,0 +1,146 @@
+import json
+import threading
+import time
+from http import HTTPStatus
+
+import pytest
+import requests
+
+from src.services.commit_service import CommitService
+from src.services.concurrency_limiter import AdaptiveConcurrencyLimiter
+from src.stand_in.faults import FaultProfile
+
+
+class FakeResponse:
+    def __init__(self, status_code: int):
+        self.status_code = status_code
+
+
+def test_healthy_saturated_responses_increase_limit():
+    limiter = AdaptiveConcurrencyLimiter(initial_limit=2, latency_target=1.0)
+
+    for _ in range(20):
+        first, second = limiter.acquire(), limiter.acquire()
+        limiter.release(first)
+        limiter.release(second)
+
+    assert limiter.limit > 2
+
+
+def test_unsaturated_responses_do_not_increase_limit():
+    limiter = AdaptiveConcurrencyLimiter(initial_limit=4, latency_target=1.0)
+
+    for _ in range(20):
+        limiter.release(limiter.acquire())
+
+    assert limiter.limit == 4
+
+
+def test_server_error_decreases_limit_once_per_generation():
+    limiter = AdaptiveConcurrencyLimiter(initial_limit=10, backoff=0.5, latency_target=1.0)
+    started = [limiter.acquire() for _ in range(4)]
+
+    # All four requests were in flight under the old limit, so only one decrease is applied
+    for request_started in started:
+        limiter.call(lambda: FakeResponse(HTTPStatus.OK.value))
+        limiter.release(request_started, failed=True)
+
+    assert limiter.limit == 5
+    limiter.call(lambda: FakeResponse(HTTPStatus.INTERNAL_SERVER_ERROR.value))
+    assert limiter.limit == 2
+
+
+def test_slow_responses_decrease_limit_and_raised_errors_count_as_failures():
+    limiter = AdaptiveConcurrencyLimiter(initial_limit=8, backoff=0.5, latency_target=0.01)
+
+    limiter.call(lambda: time.sleep(0.02) or FakeResponse(HTTPStatus.CREATED.value))
+    assert limiter.limit == 4
+
+    def raise_connection_error():
+        raise requests.ConnectionError()
+
+    with pytest.raises(requests.ConnectionError):
+        limiter.call(raise_connection_error)
+    assert limiter.limit == 2
+    assert limiter.in_flight == 0
+
+
+def test_limit_recovers_after_base_latency_steps_up():
+    limiter = AdaptiveConcurrencyLimiter(initial_limit=4, window=20, min_samples=10)
+    for _ in range(20):
+        limiter.acquire()
+        limiter.release(time.monotonic() - 0.002)
+
+    # The server now takes 6 ms for every request, even without load, and the limiter is kept saturated
+    limits = []
+    for _ in range(300):
+        started = [limiter.acquire() for _ in range(limiter.limit)]
+        for _ in started:
+            limiter.release(time.monotonic() - 0.006)
+        limits.append(limiter.limit)
+
+    assert min(limits) < 4
+    assert limiter.limit > 4
+
+
+def test_requests_over_limit_are_queued():
+    limiter = AdaptiveConcurrencyLimiter(initial_limit=1, latency_target=1.0)
+    started = limiter.acquire()
+
+    waiter = threading.Thread(target=lambda: limiter.release(limiter.acquire()))
+    waiter.start()
+    deadline = time.monotonic() + 1
+    while limiter.queue_depth == 0 and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+    assert limiter.queue_depth == 1 and limiter.in_flight == 1
+    assert limiter.acquire(timeout=0.05) is None
+    limiter.release(started)
+    waiter.join()
+    assert limiter.queue_depth == 0 and limiter.in_flight == 0
+
+
+def run_workers(limiter: AdaptiveConcurrencyLimiter, directories: list[str], seconds: float) -> list[int]:
+    stop = threading.Event()
+    limits = []
+
+    def worker(directory: str):
+        data = json.dumps({'directoryPath': directory})
+        while not stop.is_set():
+            limiter.commit(data)
+
+    threads = [threading.Thread(target=worker, args=(directory,)) for directory in directories]
+    for thread in threads:
+        thread.start()
+    deadline = time.monotonic() + seconds
+    while time.monotonic() < deadline:
+        limits.append(limiter.limit)
+        time.sleep(0.05)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    return limits
+
+
+def test_limit_follows_server_capacity(tmp_path, stand_in_server):
+    directories = []
+    for index in range(24):
+        directory = tmp_path / f"directory{index}"
+        directory.mkdir()
+        (directory / "test_file1.txt").write_text("This is a test file")
+        CommitService.commit(json.dumps({'directoryPath': str(directory)}))
+        directories.append(str(directory))
+
+    # Each request takes 50 ms until more than "capacity" requests share the server's disk
+    capacity = {'value': 2}
+    stand_in_server.faults = FaultProfile(delay=lambda rng, in_flight: 0.05 * max(1.0, in_flight / capacity['value']))
+    limiter = AdaptiveConcurrencyLimiter(initial_limit=20, max_limit=48)
+
+    congested_limits = run_workers(limiter, directories, 2.0)
+    capacity['value'] = 12
+    recovered_limits = run_workers(limiter, directories, 2.0)
+
+    congested = sum(congested_limits[-10:]) / 10
+    recovered = sum(recovered_limits[-10:]) / 10
+    assert congested < 8
+    assert recovered > congested * 2
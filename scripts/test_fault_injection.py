@@ -0,0 +1,119 @@
+import json
+import statistics
+import time
+from collections import Counter
+from http import HTTPStatus
+
+import pytest
+import requests
+
+from src.services.commit_service import CommitService
+from src.services.restore_service import RestoreService
+from src.stand_in.faults import FaultProfile
+
+REQUESTS_PER_SCENARIO = 20
+
+
+@pytest.fixture(scope='function')
+def request_data(tmp_path, stand_in_server):
+    (tmp_path / "test_file1.txt").write_text("This is a test file")
+    assert CommitService.commit(json.dumps({'directoryPath': str(tmp_path)})).status_code == HTTPStatus.CREATED.value
+    return {
+        'commit': json.dumps({'directoryPath': str(tmp_path)}),
+        'restore': json.dumps({'vcPath': str(tmp_path / ".vc" / "1"), 'destinationPath': str(tmp_path)})
+    }
+
+
+@pytest.fixture(scope='function')
+def timeouts(monkeypatch):
+    monkeypatch.setattr(CommitService, "timeout", 0.25)
+    monkeypatch.setattr(RestoreService, "timeout", 0.25)
+
+
+def measure(send, data: str, count: int = REQUESTS_PER_SCENARIO) -> dict:
+    outcomes = Counter()
+    latencies = []
+    for _ in range(count):
+        request_start = time.perf_counter()
+        try:
+            outcomes[send(data).status_code] += 1
+        except requests.Timeout:
+            outcomes['timeout'] += 1
+        except requests.ConnectionError:
+            outcomes['connection_error'] += 1
+        latencies.append(time.perf_counter() - request_start)
+    latencies.sort()
+    return {
+        'outcomes': outcomes,
+        'p50': statistics.median(latencies),
+        'p99': latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+    }
+
+
+def test_healthy_server_answers_every_request(stand_in_server, request_data, timeouts):
+    result = measure(CommitService.commit, request_data['commit'])
+
+    assert result['outcomes'] == {HTTPStatus.CONFLICT.value: REQUESTS_PER_SCENARIO}
+
+
+def test_fixed_delay_over_timeout_times_out_every_request(stand_in_server, request_data, timeouts):
+    stand_in_server.faults = FaultProfile(delay=0.4)
+
+    result = measure(RestoreService.restore, request_data['restore'], count=5)
+
+    assert result['outcomes'] == {'timeout': 5}
+    # The client gives up at its timeout instead of waiting for the delayed response
+    assert 0.25 <= result['p50'] < 0.4
+
+
+def test_delay_distribution_times_out_only_the_tail(stand_in_server, request_data, timeouts):
+    stand_in_server.faults = FaultProfile(delay=lambda rng, in_flight: 0.4 if rng.random() < 0.2 else 0.0, seed=7)
+
+    result = measure(CommitService.commit, request_data['commit'])
+
+    assert 0 < result['outcomes']['timeout'] < REQUESTS_PER_SCENARIO
+    assert result['outcomes']['timeout'] + result['outcomes'][HTTPStatus.CONFLICT.value] == REQUESTS_PER_SCENARIO
+    assert result['p50'] < 0.25 <= result['p99']
+
+
+def test_endpoint_delay_only_slows_that_endpoint(stand_in_server, request_data, timeouts):
+    stand_in_server.faults = FaultProfile(endpoint_delays={'/api/v1/restore': 0.1})
+
+    commit_result = measure(CommitService.commit, request_data['commit'])
+    restore_result = measure(RestoreService.restore, request_data['restore'])
+
+    assert commit_result['outcomes'] == restore_result['outcomes'] == {HTTPStatus.CONFLICT.value: REQUESTS_PER_SCENARIO}
+    assert restore_result['p50'] >= 0.1
+    assert stand_in_server.faults.draw('/api/v1/commit') == (None, 0.0)
+
+
+def test_slow_body_is_not_cut_off_by_read_timeout(stand_in_server, request_data, timeouts):
+    # Each chunk arrives within the timeout, so the response completes even though it takes longer in total
+    stand_in_server.faults = FaultProfile(chunk_delay=0.1, chunk_size=32)
+
+    result = measure(RestoreService.restore, request_data['restore'], count=3)
+
+    assert result['outcomes'] == {HTTPStatus.CONFLICT.value: 3}
+    assert result['p50'] > 0.25
+
+
+def test_dropped_connections_raise_connection_errors(stand_in_server, request_data, timeouts):
+    stand_in_server.faults = FaultProfile(drop_rate=0.5, seed=3)
+
+    result = measure(CommitService.commit, request_data['commit'])
+
+    assert result['outcomes']['connection_error'] == stand_in_server.stats['dropped_connections'] > 0
+    assert result['outcomes'][HTTPStatus.CONFLICT.value] == REQUESTS_PER_SCENARIO - result['outcomes'][
+        'connection_error']
+
+
+def test_intermittent_errors_return_500(stand_in_server, request_data, timeouts):
+    stand_in_server.faults = FaultProfile(error_rate=0.3, seed=11)
+
+    result = measure(RestoreService.restore, request_data['restore'])
+
+    errors = result['outcomes'][HTTPStatus.INTERNAL_SERVER_ERROR.value]
+    assert errors == stand_in_server.stats['injected_errors'] > 0
+    assert errors + result['outcomes'][HTTPStatus.CONFLICT.value] == REQUESTS_PER_SCENARIO
+    response = RestoreService.restore(request_data['restore'])
+    assert response.json()['status'] == response.status_code
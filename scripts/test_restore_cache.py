@@ -0,0 +1,159 @@
+import json
+from http import HTTPStatus
+from pathlib import Path
+
+import pytest
+
+from src.services.commit_service import CommitService
+from src.services.restore_cache import CachedRestoreService, tree_fingerprint
+from src.services.restore_service import RestoreService
+
+
+class FakeRestoreResponse:
+    def __init__(self, status_code: int, results: list[str], message: str):
+        self.status_code = status_code
+        self._body = {"status": status_code, "results": results, "message": message}
+
+    def json(self):
+        return self._body
+
+
+@pytest.fixture(scope='function')
+def restore_calls(monkeypatch):
+    # Replaces the HTTP request with a recorder so only the cache behavior is exercised
+    calls = {"count": 0, "status": HTTPStatus.CREATED.value}
+
+    def fake_restore(data: str):
+        calls["count"] += 1
+        results = [f"{path.name} has been restored\n" for path in Path(json.loads(data)["vcPath"]).rglob("*")
+                   if path.is_file()]
+        return FakeRestoreResponse(calls["status"], results, "All changed files have been restored")
+
+    monkeypatch.setattr(RestoreService, "restore", staticmethod(fake_restore))
+    return calls
+
+
+@pytest.fixture(scope='function')
+def restore_data(tmp_path):
+    (tmp_path / "test_file1.txt").write_text("This is a test file")
+    nested_directory = tmp_path / "temp"
+    nested_directory.mkdir()
+    (nested_directory / "test_file2.txt").write_text("This is a second test file")
+
+    vc_directory = tmp_path / ".vc" / "1"
+    (vc_directory / "temp").mkdir(parents=True)
+    (vc_directory / "test_file1.txt").write_text("This is a test file")
+    (vc_directory / "temp" / "test_file2.txt").write_text("This is a second test file")
+
+    return json.dumps({'vcPath': str(vc_directory), 'destinationPath': str(tmp_path)})
+
+
+def test_tree_fingerprint_ignores_version_control_directory(tmp_path, restore_data):
+    fingerprint, file_names = tree_fingerprint(str(tmp_path), exclude_version_control=True)
+    (tmp_path / ".vc" / "1" / "test_file3.txt").write_text("This is a third test file")
+
+    assert tree_fingerprint(str(tmp_path), exclude_version_control=True) == (fingerprint, file_names)
+    assert sorted(file_names) == ["test_file1.txt", "test_file2.txt"]
+
+
+def test_repeated_restore_is_answered_from_cache(restore_calls, restore_data):
+    cached_restore_service = CachedRestoreService()
+
+    first_response = cached_restore_service.restore(restore_data)
+    second_response = cached_restore_service.restore(restore_data)
+
+    assert first_response.status_code == HTTPStatus.CREATED.value
+    assert second_response.status_code == HTTPStatus.CONFLICT.value
+    assert second_response.json()["status"] == HTTPStatus.CONFLICT.value
+    assert sorted(second_response.json()["results"]) == sorted(["test_file1.txt is already up to date\n",
+                                                                "test_file2.txt is already up to date\n"])
+    assert second_response.json()["message"] == ("The requested destination directory is up to date with the "
+                                                 "version control directory")
+    assert restore_calls["count"] == 1
+    assert cached_restore_service.hits == 1 and cached_restore_service.misses == 1
+
+
+def test_cached_response_only_lists_version_control_files(tmp_path, restore_calls, restore_data):
+    (tmp_path / "extra.txt").write_text("This file is not under version control")
+    cached_restore_service = CachedRestoreService()
+    cached_restore_service.restore(restore_data)
+
+    cached_response = cached_restore_service.restore(restore_data)
+
+    assert restore_calls["count"] == 1
+    assert sorted(cached_response.json()["results"]) == sorted(["test_file1.txt is already up to date\n",
+                                                                "test_file2.txt is already up to date\n"])
+
+
+def test_cached_response_lists_files_of_delta_version(tmp_path, stand_in_server):
+    for index in range(3):
+        (tmp_path / f"test_file{index}.txt").write_text(f"This is test file {index}")
+    CommitService.commit(json.dumps({'directoryPath': str(tmp_path)}))
+    (tmp_path / "test_file0.txt").write_text("This is a changed file")
+    CommitService.commit_delta(str(tmp_path), changed=["test_file0.txt"])
+    restore_data = json.dumps({'vcPath': str(tmp_path / ".vc" / "2"), 'destinationPath': str(tmp_path)})
+    cached_restore_service = CachedRestoreService()
+
+    server_response = cached_restore_service.restore(restore_data)
+    cached_response = cached_restore_service.restore(restore_data)
+
+    # Version 2 only stores test_file0.txt, the other files are inherited from version 1
+    assert server_response.status_code == cached_response.status_code == HTTPStatus.CONFLICT.value
+    assert sorted(cached_response.json()["results"]) == sorted(server_response.json()["results"]) == [
+        f"test_file{index}.txt is already up to date\n" for index in range(3)]
+    assert stand_in_server.stats['restores'] == 1
+
+
+def test_changed_destination_invalidates_entry(tmp_path, restore_calls, restore_data):
+    cached_restore_service = CachedRestoreService()
+    cached_restore_service.restore(restore_data)
+
+    Path(f"{tmp_path}/temp/test_file2.txt").write_text("This is a changed file")
+    cached_restore_service.restore(restore_data)
+
+    assert restore_calls["count"] == 2
+    assert len(cached_restore_service) == 1
+
+
+def test_changed_version_control_directory_invalidates_entry(tmp_path, restore_calls, restore_data):
+    cached_restore_service = CachedRestoreService()
+    cached_restore_service.restore(restore_data)
+
+    Path(f"{tmp_path}/.vc/1/test_file3.txt").write_text("This is a third test file")
+    cached_restore_service.restore(restore_data)
+
+    assert restore_calls["count"] == 2
+
+
+def test_failed_restore_is_not_cached(restore_calls, restore_data):
+    restore_calls["status"] = HTTPStatus.INTERNAL_SERVER_ERROR.value
+    cached_restore_service = CachedRestoreService()
+
+    cached_restore_service.restore(restore_data)
+    cached_restore_service.restore(restore_data)
+
+    assert restore_calls["count"] == 2
+    assert len(cached_restore_service) == 0
+
+
+def test_least_recently_used_entry_is_evicted(tmp_path, restore_calls):
+    cached_restore_service = CachedRestoreService(max_entries=2)
+    requests_data = []
+    for index in range(3):
+        destination = tmp_path / f"destination{index}"
+        (destination / ".vc" / "1").mkdir(parents=True)
+        (destination / "test_file1.txt").write_text("This is a test file")
+        (destination / ".vc" / "1" / "test_file1.txt").write_text("This is a test file")
+        requests_data.append(json.dumps({'vcPath': str(destination / ".vc" / "1"),
+                                         'destinationPath': str(destination)}))
+
+    cached_restore_service.restore(requests_data[0])
+    cached_restore_service.restore(requests_data[1])
+    cached_restore_service.restore(requests_data[0])
+    cached_restore_service.restore(requests_data[2])
+    assert len(cached_restore_service) == 2
+
+    # The second pair was least recently used, so it is the one that has to be restored again
+    cached_restore_service.restore(requests_data[0])
+    cached_restore_service.restore(requests_data[1])
+    assert restore_calls["count"] == 4
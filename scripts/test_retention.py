@@ -0,0 +1,165 @@
+import datetime
+import json
+import os
+import time
+from http import HTTPStatus
+
+import pytest
+
+from src.services.commit_service import CommitService
+from src.services.retention import (RetentionPolicy, Version, delete_trees, list_versions, plan, prune,
+                                    verify)
+
+DAY = 24 * 60 * 60
+# Noon on a Wednesday, so versions a day or two older fall in the same ISO week and small ages the same day
+NOW = datetime.datetime(2024, 5, 15, 12).timestamp()
+
+
+def versions_by_age(ages_in_days: list[float], size: int = 100) -> list[Version]:
+    # Newest first, numbered from the oldest version up
+    count = len(ages_in_days)
+    return [Version(count - index, f"/tmp/.vc/{count - index}", NOW - age * DAY, size)
+            for index, age in enumerate(sorted(ages_in_days))]
+
+
+def numbers(versions: list[Version]) -> list[int]:
+    return [version.number for version in versions]
+
+
+def test_keep_last_keeps_newest_versions():
+    retention_plan = plan(versions_by_age([0, 1, 2, 3, 4]), RetentionPolicy(keep_last=2))
+
+    assert numbers(retention_plan.keep) == [5, 4]
+    assert numbers(retention_plan.delete) == [3, 2, 1]
+    assert retention_plan.bytes_freed == 300
+
+
+def test_keep_daily_keeps_newest_version_of_each_day():
+    # Three versions today, two yesterday, one on each of the three days before
+    retention_plan = plan(versions_by_age([0, 0.01, 0.02, 1, 1.01, 2, 3, 4]), RetentionPolicy(keep_daily=3))
+
+    assert numbers(retention_plan.keep) == [8, 5, 3]
+    assert numbers(retention_plan.delete) == [7, 6, 4, 2, 1]
+
+
+def test_keep_weekly_keeps_newest_version_of_each_week():
+    retention_plan = plan(versions_by_age([0, 1, 7, 8, 14, 15, 21]), RetentionPolicy(keep_weekly=2))
+
+    assert numbers(retention_plan.keep) == [7, 5]
+    assert numbers(retention_plan.delete) == [6, 4, 3, 2, 1]
+
+
+def test_max_bytes_drops_oldest_versions_and_keeps_latest():
+    versions = versions_by_age([0, 1, 2, 3])
+
+    assert numbers(plan(versions, RetentionPolicy(max_bytes=250)).keep) == [4, 3]
+    assert numbers(plan(versions, RetentionPolicy(keep_last=3, max_bytes=150)).keep) == [4]
+    assert numbers(plan(versions, RetentionPolicy(max_bytes=0)).keep) == [4]
+
+
+def test_plan_keeps_parents_of_delta_versions():
+    # Versions 1 and 4 hold all of their files, every other version is a delta on the one before
+    versions = versions_by_age([0, 1, 2, 3, 4, 5])
+    for version in versions:
+        version.parent = None if version.number in (1, 4) else version.number - 1
+
+    retention_plan = plan(versions, RetentionPolicy(keep_last=2))
+    assert numbers(retention_plan.keep) == [6, 5, 4]
+    assert numbers(retention_plan.delete) == [3, 2, 1]
+
+    # Version 3 alone is 300 bytes with its parents, so it goes before any of them can be freed
+    assert numbers(plan(versions, RetentionPolicy(keep_last=4, max_bytes=300)).keep) == [6, 5, 4]
+    assert numbers(plan(versions, RetentionPolicy(max_bytes=0)).keep) == [6, 5, 4]
+
+
+def test_max_bytes_requires_sizes():
+    with pytest.raises(ValueError):
+        plan([Version(1, "/tmp/.vc/1", time.time(), None)], RetentionPolicy(max_bytes=10))
+
+
+def test_delete_trees_removes_nested_directories(tmp_path):
+    roots = []
+    for root_index in range(3):
+        root = tmp_path / f"root{root_index}"
+        for directory_index in range(20):
+            nested_directory = root / f"temp{directory_index % 4}" / f"nested_temp{directory_index}"
+            nested_directory.mkdir(parents=True)
+            for file_index in range(5):
+                (nested_directory / f"test_file{file_index}.txt").write_text("This is a test file")
+        roots.append(str(root))
+
+    delete_trees(roots, max_workers=4)
+
+    assert os.listdir(tmp_path) == []
+
+
+def test_prune_keeps_retained_versions_restorable(tmp_path, stand_in_server):
+    (tmp_path / "temp").mkdir()
+    for index in range(6):
+        (tmp_path / "temp" / "test_file1.txt").write_text(f"This is version {index}")
+        (tmp_path / f"test_file{index}.txt").write_text(f"This is test file {index}")
+        if index in (0, 3):
+            response = CommitService.commit(json.dumps({'directoryPath': str(tmp_path)}))
+        else:
+            response = CommitService.commit_delta(str(tmp_path), changed=["temp/test_file1.txt"],
+                                                  added=[f"test_file{index}.txt"])
+        assert response.status_code == HTTPStatus.CREATED.value
+
+    versions = list_versions(str(tmp_path), with_sizes=True)
+    assert numbers(versions) == [6, 5, 4, 3, 2, 1]
+    assert all(version.size > 0 for version in versions)
+
+    # Version 5 is a delta on the full version 4, which is kept with it
+    retention_plan = plan(versions, RetentionPolicy(keep_last=2))
+    assert prune(retention_plan, max_workers=4) == [3, 2, 1]
+
+    assert sorted(os.listdir(tmp_path / ".vc")) == ["4", "5", "5.delta.json", "6", "6.delta.json"]
+    assert verify(retention_plan.keep) == {6: HTTPStatus.CREATED.value, 5: HTTPStatus.CREATED.value,
+                                           4: HTTPStatus.CREATED.value}
+    assert (tmp_path / ".vc" / "4" / "test_file0.txt").read_text() == "This is test file 0"
+    assert (tmp_path / ".vc" / "6" / "temp" / "test_file1.txt").read_text() == "This is version 5"
+
+
+def test_prune_deletes_leftovers_of_interrupted_prune(tmp_path):
+    for number in range(1, 4):
+        (tmp_path / ".vc" / str(number) / "temp").mkdir(parents=True)
+        (tmp_path / ".vc" / str(number) / "temp" / "test_file1.txt").write_text("This is a test file")
+    # An earlier prune of version 1 was interrupted after the rename, and version 1 was created again since
+    (tmp_path / ".vc" / ".deleting-1" / "temp").mkdir(parents=True)
+    (tmp_path / ".vc" / ".deleting-1" / "temp" / "test_file1.txt").write_text("This is a test file")
+
+    versions = list_versions(str(tmp_path))
+    assert numbers(versions) == [3, 2, 1]
+    assert prune(plan(versions, RetentionPolicy(keep_last=2))) == [1]
+
+    assert sorted(os.listdir(tmp_path / ".vc")) == ["2", "3"]
+
+
+def test_prune_keeps_parents_of_delta_versions(tmp_path, stand_in_server):
+    for index in range(4):
+        (tmp_path / "test_file1.txt").write_text(f"This is version {index}")
+        (tmp_path / f"test_file{index}.txt").write_text(f"This is test file {index}")
+        if index == 0:
+            response = CommitService.commit(json.dumps({'directoryPath': str(tmp_path)}))
+        else:
+            response = CommitService.commit_delta(str(tmp_path), changed=["test_file1.txt"],
+                                                  added=[f"test_file{index}.txt"])
+        assert response.status_code == HTTPStatus.CREATED.value
+    # A manifest whose version an interrupted prune already deleted
+    (tmp_path / ".vc" / "7.delta.json").write_text(json.dumps({'parent': 6, 'removed': []}))
+
+    versions = list_versions(str(tmp_path))
+    assert [version.parent for version in versions] == [3, 2, 1, None]
+
+    retention_plan = plan(versions, RetentionPolicy(keep_last=2))
+    assert prune(retention_plan) == []
+    assert sorted(os.listdir(tmp_path / ".vc")) == ["1", "2", "2.delta.json", "3", "3.delta.json", "4",
+                                                    "4.delta.json"]
+    assert verify(retention_plan.keep) == {4: HTTPStatus.CREATED.value, 3: HTTPStatus.CREATED.value,
+                                           2: HTTPStatus.CREATED.value, 1: HTTPStatus.CREATED.value}
+
+    # Once a full version is committed on top, the delta chain below it can go with its manifests
+    (tmp_path / "test_file1.txt").write_text("This is version 4")
+    assert CommitService.commit(json.dumps({'directoryPath': str(tmp_path)})).status_code == HTTPStatus.CREATED.value
+    assert prune(plan(list_versions(str(tmp_path)), RetentionPolicy(keep_last=1))) == [4, 3, 2, 1]
+    assert sorted(os.listdir(tmp_path / ".vc")) == ["5"]
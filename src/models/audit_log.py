@@ -0,0 +1,382 @@
+import mmap
+import os
+import struct
+import time
+from array import array
+from bisect import bisect_left
+from enum import IntEnum
+
+from src.models.response import Response
+
+
+class Outcome(IntEnum):
+    """
+    Outcome of a single result line, stored as one byte per line.
+    """
+    COMMITTED = 0
+    NOT_COMMITTED = 1
+    RESTORED = 2
+    NOT_RESTORED = 3
+    ALREADY_UP_TO_DATE = 4
+    REMOVED = 5
+    UP_TO_DATE = 6
+    NOT_A_DIRECTORY = 7
+    INVALID_VERSION_CONTROL = 8
+    NOT_A_FILE = 9
+    OTHER = 255
+
+
+class Kind(IntEnum):
+    """
+    Endpoint a logged Response came from.
+    """
+    COMMIT = 0
+    RESTORE = 1
+
+
+# Result lines are stored as an interned name and the outcome whose template rebuilds the line exactly
+TEMPLATES = {
+    Outcome.COMMITTED: " has been committed\n",
+    Outcome.NOT_COMMITTED: " has not been committed\n",
+    Outcome.RESTORED: " has been restored\n",
+    Outcome.NOT_RESTORED: " has not been restored\n",
+    Outcome.ALREADY_UP_TO_DATE: " is already up to date\n",
+    Outcome.REMOVED: " has been removed\n",
+    Outcome.UP_TO_DATE: " is up to date",
+    Outcome.NOT_A_DIRECTORY: " is not a directory",
+    Outcome.INVALID_VERSION_CONTROL: " is not a valid version control directory",
+    Outcome.NOT_A_FILE: " is not a file",
+}
+FAILURES = frozenset({Outcome.NOT_COMMITTED, Outcome.NOT_RESTORED, Outcome.NOT_A_DIRECTORY,
+                      Outcome.INVALID_VERSION_CONTROL, Outcome.NOT_A_FILE})
+
+STRING_TAG = b'S'
+RESPONSE_TAG = b'R'
+STRING_HEADER = struct.Struct('<cI')
+RESPONSE_HEADER = struct.Struct('<cBHdII')
+RESULT_ENTRY = struct.Struct('<IB')
+
+
+def parse_result(result: str) -> tuple[str, Outcome]:
+    """
+    Splits a result line into the name it is about and its outcome.
+
+    Parameters
+    __________
+    result: str
+        A result line of a Response, such as "test_file1.txt has been committed\n".
+
+    Returns
+    _______
+    tuple[str, Outcome]
+        The name and outcome. Lines that match no template are returned whole with Outcome.OTHER.
+    """
+    for outcome, suffix in TEMPLATES.items():
+        if result.endswith(suffix) and len(result) > len(suffix):
+            return result[:-len(suffix)], outcome
+    return result, Outcome.OTHER
+
+
+def format_result(name: str, outcome: Outcome) -> str:
+    """
+    Rebuilds the result line parsed by "parse_result".
+    """
+    return name + TEMPLATES.get(outcome, '')
+
+
+class AuditLog:
+    """
+    Append-only binary log of commit and restore Responses.
+
+    Names and messages are interned in a string table, so each result line costs five bytes
+    and each Response twenty bytes plus its lines. The file is memory-mapped when opened and
+    its records are indexed into arrays, including a posting list of result lines per name, so
+    queries such as failures for one file in the last N commits only touch that file's lines.
+
+    Records are either a string definition ("S", length, UTF-8 bytes), which takes the next
+    string id, or a Response ("R", kind, status, timestamp, message id, line count, then a
+    name id and outcome byte per line). A record cut short by an interrupted write is ignored,
+    and cut off when the log is next opened for writing. Only one process may open a log for
+    writing at a time. Others open it with "read_only", which indexes the complete records and
+    leaves the file untouched, so a record the writer is still appending is not cut off.
+    """
+    def __init__(self, path: str, read_only: bool = False):
+        """
+        Initialize an AuditLog, creating the file if it does not exist unless "read_only" is set
+
+        Parameters
+        __________
+        path: str
+            Location of the log file.
+        read_only: bool
+            Whether the log is only queried, in which case "append" raises ValueError.
+        """
+        self._path = path
+        self._read_only = read_only
+        self._strings = []
+        self._string_ids = {}
+        self._record_offsets = array('Q')
+        self._record_kinds = array('B')
+        self._kind_records = {kind: array('I') for kind in Kind}
+        self._entry_records = array('I')
+        self._entry_outcomes = array('B')
+        self._postings = {}
+        self._map = None
+        self._mapped_size = 0
+
+        if read_only:
+            self._file = open(path, 'rb')
+            self._load()
+            return
+        with open(path, 'ab'):
+            pass
+        end = self._load()
+        if end < self._mapped_size:
+            # Drops the map before the interrupted record is cut off
+            self._map.close()
+            self._map = None
+            self._mapped_size = 0
+        self._file = open(path, 'r+b')
+        self._file.truncate(end)
+        self._file.seek(end)
+
+    def __len__(self):
+        return len(self._record_offsets)
+
+    def __getitem__(self, index: int) -> Response:
+        return self.response(index)
+
+    def close(self):
+        """
+        Close the log file and its memory map.
+        """
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def append(self, response: Response, kind: Kind = Kind.COMMIT, timestamp: float | None = None) -> int:
+        """
+        Append a Response to the log.
+
+        Parameters
+        __________
+        response: Response
+            The Response to store.
+        kind: Kind
+            The endpoint the Response came from.
+        timestamp: float | None
+            Seconds since the epoch, the current time when omitted.
+
+        Returns
+        _______
+        int
+            The index of the stored Response.
+
+        Raises
+        ______
+        ValueError
+            If the log was opened read-only.
+        """
+        if self._read_only:
+            raise ValueError("the audit log was opened read-only")
+        buffer = bytearray()
+        new_strings = {}
+        message_id = self._intern(response.message, buffer, new_strings)
+        entries = [parse_result(result) for result in response.results]
+        name_ids = [self._intern(name, buffer, new_strings) for name, _ in entries]
+
+        start = self._file.tell()
+        offset = start + len(buffer)
+        try:
+            buffer += RESPONSE_HEADER.pack(RESPONSE_TAG, kind, response.status,
+                                           time.time() if timestamp is None else timestamp, message_id, len(entries))
+            for name_id, (_, outcome) in zip(name_ids, entries):
+                buffer += RESULT_ENTRY.pack(name_id, outcome)
+            self._file.write(buffer)
+            self._file.flush()
+        except BaseException:
+            # Cuts off anything partially written so the file matches the in-memory string table again
+            self._file.seek(start)
+            self._file.truncate(start)
+            raise
+
+        # New strings only take their ids once their definitions are in the file
+        for value in new_strings:
+            self._add_string(value)
+        return self._index_response(offset, kind, zip(name_ids, (outcome for _, outcome in entries)))
+
+    def response(self, index: int) -> Response:
+        """
+        Read a stored Response.
+
+        Parameters
+        __________
+        index: int
+            The index returned by "append" or a query.
+
+        Returns
+        _______
+        Response
+            The stored Response.
+        """
+        buffer = self._mapped()
+        offset = self._record_offsets[index]
+        _, _, status, _, message_id, count = RESPONSE_HEADER.unpack_from(buffer, offset)
+        offset += RESPONSE_HEADER.size
+        results = []
+        for _ in range(count):
+            name_id, outcome = RESULT_ENTRY.unpack_from(buffer, offset)
+            offset += RESULT_ENTRY.size
+            results.append(format_result(self._strings[name_id], Outcome(outcome)))
+        return Response(status=status, results=results, message=self._strings[message_id])
+
+    def timestamp(self, index: int) -> float:
+        """
+        Get the time a stored Response was appended.
+
+        Returns
+        _______
+        float
+            Seconds since the epoch.
+        """
+        return RESPONSE_HEADER.unpack_from(self._mapped(), self._record_offsets[index])[3]
+
+    def query(self, name: str, outcomes: set[Outcome] | None = None, kind: Kind | None = None,
+              last: int | None = None) -> list[int]:
+        """
+        Find the stored Responses with a result line about a name.
+
+        Parameters
+        __________
+        name: str
+            The file or directory name as it appears in result lines.
+        outcomes: set[Outcome] | None
+            Outcomes to match, any outcome when omitted.
+        kind: Kind | None
+            Endpoint to match, both when omitted.
+        last: int | None
+            Only search the last "last" Responses of "kind" (of any kind when "kind" is omitted).
+
+        Returns
+        _______
+        list[int]
+            Indexes of the matching Responses in the order they were appended.
+        """
+        name_id = self._string_ids.get(name)
+        postings = self._postings.get(name_id)
+        if postings is None:
+            return []
+
+        start = 0
+        if last is not None:
+            records = self._kind_records[kind] if kind is not None else None
+            total = len(records) if records is not None else len(self)
+            if last <= 0:
+                return []
+            if last < total:
+                first_record = records[total - last] if records is not None else total - last
+                start = bisect_left(postings, first_record, key=self._entry_records.__getitem__)
+
+        matches = []
+        for entry in postings[start:]:
+            record = self._entry_records[entry]
+            if outcomes is not None and self._entry_outcomes[entry] not in outcomes:
+                continue
+            if kind is not None and self._record_kinds[record] != kind:
+                continue
+            if not matches or matches[-1] != record:
+                matches.append(record)
+        return matches
+
+    def failures(self, name: str, last: int | None = None, kind: Kind = Kind.COMMIT) -> list[Response]:
+        """
+        Get the Responses in which a name failed.
+
+        Parameters
+        __________
+        name: str
+            The file or directory name as it appears in result lines.
+        last: int | None
+            Only search the last "last" Responses of "kind".
+        kind: Kind
+            Endpoint to search.
+
+        Returns
+        _______
+        list[Response]
+            The matching Responses in the order they were appended.
+        """
+        return [self.response(index) for index in self.query(name, set(FAILURES), kind, last)]
+
+    def _intern(self, value: str, buffer: bytearray, new_strings: dict) -> int:
+        string_id = self._string_ids.get(value, new_strings.get(value))
+        if string_id is None:
+            encoded = value.encode('utf-8')
+            buffer += STRING_HEADER.pack(STRING_TAG, len(encoded)) + encoded
+            string_id = new_strings[value] = len(self._strings) + len(new_strings)
+        return string_id
+
+    def _add_string(self, value: str) -> int:
+        string_id = len(self._strings)
+        self._strings.append(value)
+        self._string_ids[value] = string_id
+        return string_id
+
+    def _index_response(self, offset: int, kind: int, entries) -> int:
+        record = len(self._record_offsets)
+        self._record_offsets.append(offset)
+        self._record_kinds.append(kind)
+        self._kind_records[Kind(kind)].append(record)
+        for name_id, outcome in entries:
+            entry = len(self._entry_records)
+            self._entry_records.append(record)
+            self._entry_outcomes.append(outcome)
+            postings = self._postings.get(name_id)
+            if postings is None:
+                postings = self._postings[name_id] = array('I')
+            postings.append(entry)
+        return record
+
+    def _mapped(self):
+        size = os.path.getsize(self._path)
+        if self._map is None or size > self._mapped_size:
+            if self._map is not None:
+                self._map.close()
+            with open(self._path, 'rb') as file:
+                self._map = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+            self._mapped_size = size
+        return self._map
+
+    def _load(self) -> int:
+        if os.path.getsize(self._path) == 0:
+            return 0
+        buffer = self._mapped()
+        offset = 0
+        size = len(buffer)
+        while offset < size:
+            tag = buffer[offset:offset + 1]
+            if tag == STRING_TAG and offset + STRING_HEADER.size <= size:
+                _, length = STRING_HEADER.unpack_from(buffer, offset)
+                end = offset + STRING_HEADER.size + length
+                if end > size:
+                    break
+                self._add_string(buffer[offset + STRING_HEADER.size:end].decode('utf-8'))
+            elif tag == RESPONSE_TAG and offset + RESPONSE_HEADER.size <= size:
+                _, kind, _, _, _, count = RESPONSE_HEADER.unpack_from(buffer, offset)
+                end = offset + RESPONSE_HEADER.size + count * RESULT_ENTRY.size
+                if end > size:
+                    break
+                entries = [RESULT_ENTRY.unpack_from(buffer, offset + RESPONSE_HEADER.size + index * RESULT_ENTRY.size)
+                           for index in range(count)]
+                self._index_response(offset, kind, entries)
+            else:
+                break
+            offset = end
+        return offset
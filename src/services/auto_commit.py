@@ -0,0 +1,473 @@
+import argparse
+import ctypes
+import ctypes.util
+import json
+import os
+import select
+import statistics
+import struct
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http import HTTPStatus
+
+from src.services.commit_service import CommitService
+
+VERSION_CONTROL_DIRECTORY_NAME = '.vc'
+
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = 0o0004000
+IN_CLOEXEC = 0o2000000
+
+WATCH_MASK = (IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE | IN_DELETE_SELF
+              | IN_MOVE_SELF | IN_ONLYDIR)
+EVENT_HEADER = struct.Struct('iIII')
+
+
+class InotifyWatcher:
+    """
+    Recursive inotify watch over a set of directories, skipping ".vc" directories.
+
+    Only available on Linux. Events are read with "read_events" and reported as
+    (root directory, path, mask) tuples, where the root is the watched directory the path is under.
+    """
+    def __init__(self, directories: list[str]):
+        """
+        Initialize an InotifyWatcher
+
+        Parameters
+        __________
+        directories: list[str]
+            The directories to watch, including all of their subdirectories.
+
+        Raises
+        ______
+        OSError
+            If inotify is not available or a watch cannot be added.
+        """
+        self._libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        self._fd = self._libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self._fd < 0:
+            error = ctypes.get_errno()
+            raise OSError(error, os.strerror(error))
+        self._watches = {}
+        self._wake_read, self._wake_write = os.pipe()
+        os.set_blocking(self._wake_read, False)
+        for directory in directories:
+            self.add_tree(os.path.abspath(directory), os.path.abspath(directory))
+
+    def fileno(self) -> int:
+        return self._fd
+
+    def close(self):
+        """
+        Close the inotify file descriptor and drop every watch.
+        """
+        if self._fd >= 0:
+            os.close(self._fd)
+            os.close(self._wake_read)
+            os.close(self._wake_write)
+            self._fd = -1
+        self._watches.clear()
+
+    def wake(self):
+        """
+        Make a "read_events" call that is waiting return early.
+        """
+        os.write(self._wake_write, b'\0')
+
+    def add_tree(self, root: str, directory_path: str):
+        """
+        Watch a directory and every subdirectory under it, except ".vc" directories.
+
+        Parameters
+        __________
+        root: str
+            The watched directory the tree belongs to.
+        directory_path: str
+            The top of the tree to watch.
+        """
+        for current, directories, _ in os.walk(directory_path):
+            directories[:] = [name for name in directories if name != VERSION_CONTROL_DIRECTORY_NAME]
+            watch_descriptor = self._libc.inotify_add_watch(self._fd, os.fsencode(current), WATCH_MASK)
+            if watch_descriptor < 0:
+                error = ctypes.get_errno()
+                # The directory may already be gone again by the time it is watched
+                if error == 2:
+                    continue
+                raise OSError(error, os.strerror(error), current)
+            self._watches[watch_descriptor] = (root, current)
+
+    def read_events(self, timeout: float | None) -> list[tuple[str, str, int]]:
+        """
+        Wait up to "timeout" seconds for events and return every event that is available.
+
+        Parameters
+        __________
+        timeout: float | None
+            Maximum number of seconds to wait, None waits until an event arrives or "wake" is called.
+
+        Returns
+        _______
+        list[tuple[str, str, int]]
+            (root directory, path, mask) for each event, empty when woken by "wake" or when the
+            timeout expires. A queue overflow is reported with an empty root and path.
+        """
+        timeout = None if timeout is None else max(timeout, 0)
+        readable, _, _ = select.select([self._fd, self._wake_read], [], [], timeout)
+        if self._wake_read in readable:
+            try:
+                os.read(self._wake_read, 1024)
+            except BlockingIOError:
+                pass
+        if self._fd not in readable:
+            return []
+
+        events = []
+        while True:
+            try:
+                buffer = os.read(self._fd, 64 * 1024)
+            except BlockingIOError:
+                break
+            offset = 0
+            while offset < len(buffer):
+                watch_descriptor, mask, _, name_length = EVENT_HEADER.unpack_from(buffer, offset)
+                name = buffer[offset + EVENT_HEADER.size:offset + EVENT_HEADER.size + name_length].rstrip(b'\0')
+                offset += EVENT_HEADER.size + name_length
+
+                if mask & IN_Q_OVERFLOW:
+                    events.append(('', '', mask))
+                    continue
+                if mask & IN_IGNORED:
+                    self._watches.pop(watch_descriptor, None)
+                    continue
+                if watch_descriptor not in self._watches:
+                    continue
+                root, directory_path = self._watches[watch_descriptor]
+                name = os.fsdecode(name)
+                if name == VERSION_CONTROL_DIRECTORY_NAME and directory_path == root:
+                    continue
+
+                path = os.path.join(directory_path, name) if name else directory_path
+                if mask & IN_ISDIR and mask & (IN_CREATE | IN_MOVED_TO):
+                    self.add_tree(root, path)
+                events.append((root, path, mask))
+        return events
+
+
+class _Batch:
+    def __init__(self, now: float):
+        self.first_event = now
+        self.last_event = now
+        self.events = 0
+        self.paths = set()
+        self.needs_full_commit = False
+        self.not_before = now
+
+
+class AutoCommitDaemon:
+    """
+    Commits watched directories only after they change.
+
+    Bursts of inotify events are coalesced per directory: a directory is committed once no event
+    has arrived for "debounce" seconds, or once "max_delay" seconds have passed since the first
+    event of the burst. At most "max_concurrent_commits" commits are in flight at once, and events
+    arriving while a directory is being committed are held for its next commit.
+
+    The paths of a commit that fails with a 5xx or an exception are merged into the directory's
+    next batch, which is not sent before "retry_backoff" seconds, doubling with each consecutive
+    failure up to "max_retry_backoff". A delta commit the server rejects with a 4xx other than a
+    409 is sent again right away as a full commit.
+    """
+    def __init__(self, directories: list[str], debounce: float = 0.5, max_delay: float = 5.0,
+                 max_concurrent_commits: int = 2, use_delta: bool = False, retry_backoff: float = 1.0,
+                 max_retry_backoff: float = 60.0):
+        """
+        Initialize an AutoCommitDaemon
+
+        Parameters
+        __________
+        directories: list[str]
+            The directories to watch and commit.
+        debounce: float
+            Seconds without events before a directory is committed.
+        max_delay: float
+            Maximum seconds between the first event of a burst and its commit.
+        max_concurrent_commits: int
+            Maximum number of commits in flight at once.
+        use_delta: bool
+            Whether commits send only the paths seen in events, see CommitService.commit_delta.
+        retry_backoff: float
+            Seconds to wait before retrying a directory after its first failed commit.
+        max_retry_backoff: float
+            Maximum seconds to wait before retrying a directory.
+        """
+        if max_concurrent_commits < 1:
+            raise ValueError("max_concurrent_commits must be at least 1")
+        if retry_backoff < 0 or max_retry_backoff < retry_backoff:
+            raise ValueError("retry_backoff must not be negative or greater than max_retry_backoff")
+        self._directories = [os.path.abspath(directory) for directory in directories]
+        self._debounce = debounce
+        self._max_delay = max_delay
+        self._max_concurrent_commits = max_concurrent_commits
+        self._use_delta = use_delta
+        self._retry_backoff = retry_backoff
+        self._max_retry_backoff = max_retry_backoff
+        self._lock = threading.Lock()
+        self._pending = {}
+        self._committing = set()
+        self._failures = {}
+        self._latencies = []
+        self._statuses = {}
+        self._events = 0
+        self._commits = 0
+        self._commits_avoided = 0
+        self._peak_in_flight = 0
+        self._stop = threading.Event()
+        self._thread = None
+        self._watcher = None
+        self._executor = None
+
+    @property
+    def commits(self) -> int:
+        """
+        Get the number of commits sent.
+
+        Returns
+        _______
+        int
+            The number of commits sent to the commit API endpoint.
+        """
+        with self._lock:
+            return self._commits
+
+    @property
+    def commits_avoided(self) -> int:
+        """
+        Get the number of commits saved by coalescing events.
+
+        Returns
+        _______
+        int
+            The number of events that did not need a commit of their own.
+        """
+        with self._lock:
+            return self._commits_avoided
+
+    @property
+    def peak_in_flight(self) -> int:
+        """
+        Get the highest number of commits that were in flight at once.
+
+        Returns
+        _______
+        int
+            The peak number of concurrent commits.
+        """
+        with self._lock:
+            return self._peak_in_flight
+
+    def report(self) -> dict:
+        """
+        Summarize the event-to-commit latency and the commits avoided so far.
+
+        Returns
+        _______
+        dict
+            Counts of events, commits and commits avoided, the status codes returned, and the
+            median, 95th percentile and maximum event-to-commit latency in seconds.
+        """
+        with self._lock:
+            latencies = sorted(self._latencies)
+            summary = {
+                'events': self._events,
+                'commits': self._commits,
+                'commits_avoided': self._commits_avoided,
+                'statuses': dict(self._statuses),
+                'latency_p50': None,
+                'latency_p95': None,
+                'latency_max': None
+            }
+        if latencies:
+            summary['latency_p50'] = statistics.median(latencies)
+            summary['latency_p95'] = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+            summary['latency_max'] = latencies[-1]
+        return summary
+
+    def start(self):
+        """
+        Start watching on a background thread.
+
+        Raises
+        ______
+        OSError
+            If inotify is not available or a directory cannot be watched.
+        """
+        self._watcher = InotifyWatcher(self._directories)
+        self._executor = ThreadPoolExecutor(max_workers=self._max_concurrent_commits)
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """
+        Stop watching and wait for commits in flight. Pending events are not committed.
+        """
+        self._stop.set()
+        if self._watcher is not None:
+            self._watcher.wake()
+        if self._thread is not None:
+            self._thread.join()
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+        if self._watcher is not None:
+            self._watcher.close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+    def _run(self):
+        while not self._stop.is_set():
+            for root, path, mask in self._watcher.read_events(self._next_timeout()):
+                self._record(root, path, mask)
+            self._submit_ready()
+
+    def _record(self, root: str, path: str, mask: int):
+        now = time.monotonic()
+        roots = self._directories if mask & IN_Q_OVERFLOW else [root]
+        with self._lock:
+            for directory in roots:
+                batch = self._pending.get(directory)
+                if batch is None:
+                    batch = self._pending[directory] = _Batch(now)
+                batch.last_event = now
+                batch.events += 1
+                self._events += 1
+                # Directory level changes and lost events cannot be described as a list of files
+                if mask & (IN_ISDIR | IN_Q_OVERFLOW | IN_DELETE_SELF | IN_MOVE_SELF):
+                    batch.needs_full_commit = True
+                else:
+                    batch.paths.add(os.path.relpath(path, directory))
+
+    def _next_timeout(self) -> float | None:
+        now = time.monotonic()
+        with self._lock:
+            # With every slot busy nothing can be submitted, so the loop waits for events or for "_commit" to wake it
+            if len(self._committing) >= self._max_concurrent_commits:
+                return None
+            deadlines = [max(min(batch.last_event + self._debounce, batch.first_event + self._max_delay),
+                             batch.not_before)
+                         for directory, batch in self._pending.items() if directory not in self._committing]
+        if not deadlines:
+            return None
+        return max(min(deadlines) - now, 0)
+
+    def _submit_ready(self):
+        now = time.monotonic()
+        with self._lock:
+            for directory, batch in list(self._pending.items()):
+                if directory in self._committing or len(self._committing) >= self._max_concurrent_commits:
+                    continue
+                if now - batch.last_event < self._debounce and now - batch.first_event < self._max_delay:
+                    continue
+                if now < batch.not_before:
+                    continue
+                del self._pending[directory]
+                self._committing.add(directory)
+                self._peak_in_flight = max(self._peak_in_flight, len(self._committing))
+                self._executor.submit(self._commit, directory, batch)
+
+    def _commit(self, directory: str, batch: _Batch):
+        statuses = []
+        failed = True
+        try:
+            response = None
+            if self._use_delta and not batch.needs_full_commit:
+                existing = sorted(path for path in batch.paths if os.path.isfile(os.path.join(directory, path)))
+                removed = sorted(path for path in batch.paths if not os.path.lexists(os.path.join(directory, path)))
+                response = CommitService.commit_delta(directory, changed=existing, removed=removed)
+                statuses.append(response.status_code)
+                # A rejected delta, such as one listing a path that stopped being a regular file, is sent in full
+                if (HTTPStatus.BAD_REQUEST.value <= response.status_code < HTTPStatus.INTERNAL_SERVER_ERROR.value
+                        and response.status_code != HTTPStatus.CONFLICT.value):
+                    response = None
+            if response is None:
+                response = CommitService.commit(json.dumps({'directoryPath': directory}))
+                statuses.append(response.status_code)
+            failed = response.status_code >= HTTPStatus.INTERNAL_SERVER_ERROR.value
+        except Exception as error:
+            statuses.append(type(error).__name__)
+        finally:
+            with self._lock:
+                self._committing.discard(directory)
+                self._commits += len(statuses)
+                for status in statuses:
+                    self._statuses[status] = self._statuses.get(status, 0) + 1
+                if failed:
+                    self._requeue(directory, batch)
+                else:
+                    self._failures.pop(directory, None)
+                    self._commits_avoided += batch.events - 1
+                    self._latencies.append(time.monotonic() - batch.first_event)
+            self._watcher.wake()
+
+    def _requeue(self, directory: str, batch: _Batch):
+        # The paths of a failed commit are merged into the next batch, which backs off before it is retried
+        failures = self._failures[directory] = self._failures.get(directory, 0) + 1
+        not_before = time.monotonic() + min(self._retry_backoff * 2 ** (failures - 1), self._max_retry_backoff)
+        pending = self._pending.get(directory)
+        if pending is None:
+            batch.not_before = not_before
+            self._pending[directory] = batch
+            return
+        pending.first_event = batch.first_event
+        pending.events += batch.events
+        pending.paths |= batch.paths
+        pending.needs_full_commit = pending.needs_full_commit or batch.needs_full_commit
+        pending.not_before = not_before
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Commit directories through the FileVersionControl API when they "
+                                                 "change")
+    parser.add_argument('directories', nargs='+', help="directories to watch")
+    parser.add_argument('--debounce', type=float, default=0.5, help="seconds without events before committing")
+    parser.add_argument('--max-delay', type=float, default=5.0, help="maximum seconds from first event to commit")
+    parser.add_argument('--max-concurrent-commits', type=int, default=2, help="maximum commits in flight")
+    parser.add_argument('--delta', action='store_true', help="send only the changed paths with each commit")
+    parser.add_argument('--retry-backoff', type=float, default=1.0, help="seconds before retrying a failed commit")
+    parser.add_argument('--max-retry-backoff', type=float, default=60.0, help="maximum seconds between retries")
+    arguments = parser.parse_args()
+
+    daemon = AutoCommitDaemon(arguments.directories, debounce=arguments.debounce, max_delay=arguments.max_delay,
+                              max_concurrent_commits=arguments.max_concurrent_commits, use_delta=arguments.delta,
+                              retry_backoff=arguments.retry_backoff, max_retry_backoff=arguments.max_retry_backoff)
+    daemon.start()
+    try:
+        while True:
+            time.sleep(60)
+            print(json.dumps(daemon.report()), flush=True)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        daemon.stop()
+        print(json.dumps(daemon.report()), flush=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,3 +1,5 @@
+import json
+
 import requests
 
 
@@ -8,6 +10,10 @@ class CommitService:
         The service sends requests to the commit API endpoint at:
         http://localhost:8080/api/v1/commit
         """
+    url = 'http://localhost:8080/api/v1/commit'
+    # Seconds to wait for the connection and for each read, None waits indefinitely
+    timeout = None
+
     @staticmethod
     def commit(data: str):
         """
@@ -28,5 +34,73 @@ class CommitService:
         requests.RequestException
             If the HTTP request encounters an error.
         """
-        return requests.request(method='POST', url='http://localhost:8080/api/v1/commit', data=data,
+        return requests.request(method='POST', url=CommitService.url, timeout=CommitService.timeout, data=data,
                                 headers={"Content-Type": "application/json"})
+
+    @staticmethod
+    def delta_payload(directory_path: str, changed: list[str] | None = None, added: list[str] | None = None,
+                      renamed: list[tuple[str, str]] | None = None, removed: list[str] | None = None) -> str:
+        """
+        Builds a commit request body that carries the paths already known to have changed.
+
+        Paths are relative to the directory being committed, so the API endpoint only has to
+        read the listed files instead of scanning the whole directory.
+
+        Parameters
+        __________
+        directory_path: str
+            The directory being committed.
+        changed: list[str] | None
+            Paths of files whose content has changed.
+        added: list[str] | None
+            Paths of files created since the last commit.
+        renamed: list[tuple[str, str]] | None
+            (old path, new path) pairs of renamed files.
+        removed: list[str] | None
+            Paths of files deleted since the last commit.
+
+        Returns
+        _______
+        str
+            A JSON string representing the data to commit.
+        """
+        return json.dumps({
+            'directoryPath': directory_path,
+            'delta': {
+                'changed': list(changed or []),
+                'added': list(added or []),
+                'renamed': [{'from': source, 'to': target} for source, target in renamed or []],
+                'removed': list(removed or [])
+            }
+        })
+
+    @staticmethod
+    def commit_delta(directory_path: str, changed: list[str] | None = None, added: list[str] | None = None,
+                     renamed: list[tuple[str, str]] | None = None, removed: list[str] | None = None):
+        """
+        Commits only the listed paths of a directory to the commit API endpoint.
+
+        Parameters
+        __________
+        directory_path: str
+            The directory being committed.
+        changed: list[str] | None
+            Paths of files whose content has changed.
+        added: list[str] | None
+            Paths of files created since the last commit.
+        renamed: list[tuple[str, str]] | None
+            (old path, new path) pairs of renamed files.
+        removed: list[str] | None
+            Paths of files deleted since the last commit.
+
+        Returns
+        _______
+        requests.Response
+            The response object from the POST request.
+
+        Raises
+        ______
+        requests.RequestException
+            If the HTTP request encounters an error.
+        """
+        return CommitService.commit(CommitService.delta_payload(directory_path, changed, added, renamed, removed))
@@ -0,0 +1,236 @@
+import threading
+import time
+from collections import deque
+from http import HTTPStatus
+
+from src.services.commit_service import CommitService
+from src.services.restore_service import RestoreService
+
+
+class AdaptiveConcurrencyLimiter:
+    """
+    Limits in-flight commit and restore requests with additive increase, multiplicative decrease.
+
+    The limit grows by one per limit's worth of healthy responses while the limiter is saturated,
+    and is multiplied by "backoff" when a response is a 5xx, raises, or is slower than the latency
+    threshold. The threshold is "latency_target" when given, otherwise "tolerance" times the lowest
+    latency among the last "window" requests that did not fail. Slow responses are part of that
+    window too, so a lasting rise in the server's unloaded latency becomes the new baseline once
+    it fills the window. Requests over the limit wait in a queue.
+    """
+    def __init__(self, initial_limit: int = 4, min_limit: int = 1, max_limit: int = 64, backoff: float = 0.7,
+                 tolerance: float = 2.0, latency_target: float | None = None, window: int = 100,
+                 min_samples: int = 10):
+        """
+        Initialize an AdaptiveConcurrencyLimiter
+
+        Parameters
+        __________
+        initial_limit: int
+            Number of requests allowed in flight before any latency is observed.
+        min_limit: int
+            Lowest limit the limiter can back off to.
+        max_limit: int
+            Highest limit the limiter can grow to.
+        backoff: float
+            Factor the limit is multiplied by when the server is overloaded.
+        tolerance: float
+            Multiple of the baseline latency above which a response counts as overloaded.
+        latency_target: float | None
+            Fixed latency threshold in seconds, replaces the baseline based threshold when given.
+        window: int
+            Number of recent latencies the baseline is taken from.
+        min_samples: int
+            Number of latencies needed before slow responses reduce the limit.
+        """
+        if not 1 <= min_limit <= initial_limit <= max_limit:
+            raise ValueError("limits must satisfy 1 <= min_limit <= initial_limit <= max_limit")
+        if not 0 < backoff < 1:
+            raise ValueError("backoff must be between 0 and 1")
+        self._min_limit = min_limit
+        self._max_limit = max_limit
+        self._backoff = backoff
+        self._tolerance = tolerance
+        self._latency_target = latency_target
+        self._min_samples = min_samples
+        self._condition = threading.Condition()
+        self._limit = float(initial_limit)
+        self._in_flight = 0
+        self._waiting = 0
+        self._latencies = deque(maxlen=window)
+        self._last_decrease = float('-inf')
+
+    @property
+    def limit(self) -> int:
+        """
+        Get the current concurrency limit.
+
+        Returns
+        _______
+        int
+            The number of requests currently allowed in flight.
+        """
+        with self._condition:
+            return int(self._limit)
+
+    @property
+    def in_flight(self) -> int:
+        """
+        Get the number of requests in flight.
+
+        Returns
+        _______
+        int
+            The number of requests holding a slot.
+        """
+        with self._condition:
+            return self._in_flight
+
+    @property
+    def queue_depth(self) -> int:
+        """
+        Get the number of requests waiting for a slot.
+
+        Returns
+        _______
+        int
+            The number of queued requests.
+        """
+        with self._condition:
+            return self._waiting
+
+    def acquire(self, timeout: float | None = None) -> float | None:
+        """
+        Wait for a slot under the current limit.
+
+        Parameters
+        __________
+        timeout: float | None
+            Maximum number of seconds to wait, or None to wait indefinitely.
+
+        Returns
+        _______
+        float | None
+            The time the slot was acquired, to pass to "release", or None if the timeout expired.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._condition:
+            self._waiting += 1
+            try:
+                while self._in_flight >= int(self._limit):
+                    remaining = None if deadline is None else deadline - time.monotonic()
+                    if remaining is not None and remaining <= 0:
+                        return None
+                    self._condition.wait(remaining)
+                self._in_flight += 1
+                return time.monotonic()
+            finally:
+                self._waiting -= 1
+
+    def release(self, started: float, failed: bool = False):
+        """
+        Free a slot and adjust the limit from the request's outcome.
+
+        Parameters
+        __________
+        started: float
+            The value returned by "acquire".
+        failed: bool
+            Whether the request raised or returned a 5xx status code.
+        """
+        now = time.monotonic()
+        latency = now - started
+        with self._condition:
+            saturated = self._in_flight >= int(self._limit) or self._waiting > 0
+            self._in_flight -= 1
+
+            overloaded = failed or latency > self._threshold()
+            if not failed:
+                self._latencies.append(latency)
+            if overloaded:
+                # Requests started before the last decrease describe the old limit, so they are not counted twice
+                if started > self._last_decrease:
+                    self._limit = max(float(self._min_limit), self._limit * self._backoff)
+                    self._last_decrease = now
+            elif saturated:
+                self._limit = min(float(self._max_limit), self._limit + 1 / self._limit)
+            self._condition.notify_all()
+
+    def call(self, function, *args, **kwargs):
+        """
+        Run a request function under the limiter.
+
+        Parameters
+        __________
+        function: Callable
+            A function returning a requests.Response, such as CommitService.commit.
+        *args, **kwargs
+            Arguments passed to the function.
+
+        Returns
+        _______
+        requests.Response
+            The response returned by the function.
+
+        Raises
+        ______
+        requests.RequestException
+            If the HTTP request encounters an error.
+        """
+        started = self.acquire()
+        failed = True
+        try:
+            response = function(*args, **kwargs)
+            failed = response.status_code >= HTTPStatus.INTERNAL_SERVER_ERROR.value
+            return response
+        finally:
+            self.release(started, failed)
+
+    def commit(self, data: str):
+        """
+        Sends a JSON-formatted string to the commit API endpoint under the limiter.
+
+        Parameters
+        __________
+        data: str
+            A JSON string representing the data to commit.
+
+        Returns
+        _______
+        requests.Response
+            The response object from the POST request.
+
+        Raises
+        ______
+        requests.RequestException
+            If the HTTP request encounters an error.
+        """
+        return self.call(CommitService.commit, data)
+
+    def restore(self, data: str):
+        """
+        Sends a JSON-formatted string to the restore API endpoint under the limiter.
+
+        Parameters
+        __________
+        data: str
+            A JSON string representing the data to restore.
+
+        Returns
+        _______
+        requests.Response
+            The response object from the POST request.
+
+        Raises
+        ______
+        requests.RequestException
+            If the HTTP request encounters an error.
+        """
+        return self.call(RestoreService.restore, data)
+
+    def _threshold(self) -> float:
+        if self._latency_target is not None:
+            return self._latency_target
+        if len(self._latencies) < self._min_samples:
+            return float('inf')
+        return min(self._latencies) * self._tolerance
@@ -0,0 +1,200 @@
+import hashlib
+import json
+import os
+from collections import OrderedDict
+from http import HTTPStatus
+
+import requests
+
+from src.models.audit_log import parse_result
+from src.services.restore_service import RestoreService
+
+VERSION_CONTROL_DIRECTORY_NAME = '.vc'
+UP_TO_DATE_MESSAGE = "The requested destination directory is up to date with the version control directory"
+
+
+def tree_fingerprint(directory_path: str, exclude_version_control: bool = False) -> tuple[str, list[str]]:
+    """
+    Computes a cheap fingerprint of a directory tree from file metadata only.
+
+    Every regular file contributes its relative path, size and modification time, so no file
+    contents are read. Two trees with the same fingerprint are treated as unchanged.
+
+    Parameters
+    __________
+    directory_path: str
+        The root of the directory tree to fingerprint.
+    exclude_version_control: bool
+        Whether ".vc" directories are skipped during the walk.
+
+    Returns
+    _______
+    tuple[str, list[str]]
+        The hex digest of the tree and the names of the files found in it.
+        The digest is an empty string if the directory does not exist.
+    """
+    if not os.path.isdir(directory_path):
+        return '', []
+
+    entries = []
+    pending = [directory_path]
+    while pending:
+        current = pending.pop()
+        with os.scandir(current) as iterator:
+            for entry in iterator:
+                if entry.is_dir(follow_symlinks=False):
+                    if not (exclude_version_control and entry.name == VERSION_CONTROL_DIRECTORY_NAME):
+                        pending.append(entry.path)
+                elif entry.is_file(follow_symlinks=False):
+                    file_stat = entry.stat(follow_symlinks=False)
+                    relative_path = os.path.relpath(entry.path, directory_path)
+                    entries.append((relative_path, file_stat.st_size, file_stat.st_mtime_ns, entry.name))
+
+    entries.sort()
+    digest = hashlib.blake2b(digest_size=16)
+    for relative_path, size, mtime_ns, _ in entries:
+        digest.update(f"{relative_path}\0{size}\0{mtime_ns}\n".encode())
+    return digest.hexdigest(), [name for *_, name in entries]
+
+
+def _up_to_date_response(results: list[str]) -> requests.Response:
+    # Mirrors the 409 the API endpoint answers, so callers can read it like any other response
+    response = requests.Response()
+    response.status_code = HTTPStatus.CONFLICT.value
+    response.url = RestoreService.url
+    response.encoding = 'utf-8'
+    response.headers['Content-Type'] = 'application/json'
+    response._content = json.dumps({'status': HTTPStatus.CONFLICT.value, 'results': results,
+                                    'message': UP_TO_DATE_MESSAGE}).encode()
+    return response
+
+
+class CachedRestoreService:
+    """
+    Restore service that skips requests whose outcome is already known.
+
+    After a successful restore (201 or 409) the fingerprints of the version control directory
+    and the destination directory are remembered, along with the names the API endpoint listed.
+    A later restore of the same pair is answered locally with a 409 "up to date" response for
+    those names while both fingerprints are unchanged, so a version that inherits files from its
+    parents is reported the way the API endpoint reported it. Entries are kept in least
+    recently used order and evicted once more than "max_entries" are stored.
+
+    "restore" returns a requests.Response on hits and misses alike, so it can be used wherever
+    RestoreService.restore is.
+    """
+    def __init__(self, max_entries: int = 128):
+        """
+        Initialize a CachedRestoreService
+
+        Parameters
+        __________
+        max_entries: int
+            Maximum number of (vcPath, destinationPath) pairs kept in the cache.
+        """
+        if max_entries < 1:
+            raise ValueError("max_entries must be at least 1")
+        self._max_entries = max_entries
+        self._entries = OrderedDict()
+        self._current_keys = {}
+        self._hits = 0
+        self._misses = 0
+
+    @property
+    def hits(self) -> int:
+        """
+        Get the number of restores answered from the cache.
+
+        Returns
+        _______
+        int
+            The number of cache hits.
+        """
+        return self._hits
+
+    @property
+    def misses(self) -> int:
+        """
+        Get the number of restores sent to the API endpoint.
+
+        Returns
+        _______
+        int
+            The number of cache misses.
+        """
+        return self._misses
+
+    def __len__(self):
+        return len(self._entries)
+
+    def clear(self):
+        """
+        Remove every cached entry.
+        """
+        self._entries.clear()
+        self._current_keys.clear()
+
+    def restore(self, data: str) -> requests.Response:
+        """
+        Restores a version control directory unless the cache shows it is already up to date.
+
+        Parameters
+        __________
+        data: str
+            A JSON string containing "vcPath" and "destinationPath".
+
+        Returns
+        _______
+        requests.Response
+            A 409 "up to date" response built from the cache, or the response of the API endpoint.
+
+        Raises
+        ______
+        requests.RequestException
+            If the HTTP request encounters an error.
+        """
+        request_dict = json.loads(data)
+        vc_path = str(request_dict.get('vcPath', ''))
+        destination_path = str(request_dict.get('destinationPath', ''))
+        pair = (vc_path, destination_path)
+
+        vc_fingerprint, _ = tree_fingerprint(vc_path)
+        destination_fingerprint, _ = tree_fingerprint(destination_path, exclude_version_control=True)
+        key = (vc_path, destination_path, destination_fingerprint)
+
+        # Drops the entry recorded for this pair when the destination has changed since
+        stale_key = self._current_keys.get(pair)
+        if stale_key is not None and stale_key != key:
+            self._invalidate(pair)
+
+        cached_vc_fingerprint, names = self._entries.get(key, (None, None))
+        if vc_fingerprint and destination_fingerprint and cached_vc_fingerprint == vc_fingerprint:
+            self._entries.move_to_end(key)
+            self._hits += 1
+            return _up_to_date_response([f"{name} is already up to date\n" for name in names])
+        if cached_vc_fingerprint is not None:
+            self._invalidate(pair)
+
+        self._misses += 1
+        restore_response = RestoreService.restore(data)
+
+        if restore_response.status_code in (HTTPStatus.CREATED.value, HTTPStatus.CONFLICT.value):
+            # The restore rewrote files in the destination, so it is fingerprinted again
+            destination_fingerprint, _ = tree_fingerprint(destination_path, exclude_version_control=True)
+            names = [parse_result(result)[0] for result in restore_response.json()["results"]]
+            self._store(pair, (vc_path, destination_path, destination_fingerprint), (vc_fingerprint, names))
+
+        return restore_response
+
+    def _store(self, pair: tuple[str, str], key: tuple[str, str, str], entry: tuple[str, list[str]]):
+        self._invalidate(pair)
+        self._entries[key] = entry
+        self._current_keys[pair] = key
+        while len(self._entries) > self._max_entries:
+            evicted_key, _ = self._entries.popitem(last=False)
+            del self._current_keys[evicted_key[:2]]
+
+    def _invalidate(self, pair: tuple[str, str]):
+        key = self._current_keys.pop(pair, None)
+        if key is not None:
+            self._entries.pop(key, None)
@@ -8,6 +8,10 @@ class RestoreService:
     The service sends requests to the restore API endpoint at:
     http://localhost:8080/api/v1/restore
     """
+    url = 'http://localhost:8080/api/v1/restore'
+    # Seconds to wait for the connection and for each read, None waits indefinitely
+    timeout = None
+
     @staticmethod
     def restore(data: str):
         """
@@ -28,5 +32,5 @@ class RestoreService:
         requests.RequestException
             If the HTTP request encounters an error.
         """
-        return requests.request(method='POST', url='http://localhost:8080/api/v1/restore',
+        return requests.request(method='POST', url=RestoreService.url, timeout=RestoreService.timeout,
                                 data=data, headers={"Content-Type": "application/json"})
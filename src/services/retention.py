@@ -0,0 +1,379 @@
+import argparse
+import datetime
+import json
+import os
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from http import HTTPStatus
+
+from src.services.restore_service import RestoreService
+
+VERSION_CONTROL_DIRECTORY_NAME = '.vc'
+DELTA_MANIFEST_SUFFIX = '.delta.json'
+DELETING_PREFIX = '.deleting-'
+
+
+class RetentionPolicy:
+    """
+    Describes which versions in a ".vc" directory are kept.
+
+    A version is kept if any of "keep_last", "keep_daily" or "keep_weekly" selects it, or every
+    version is kept when none of them is given. "max_bytes" then drops the oldest kept versions
+    until the kept versions fit. The latest version is always kept, and so is every version a
+    kept delta version was built on, counted toward "max_bytes".
+    """
+    def __init__(self, keep_last: int | None = None, keep_daily: int | None = None, keep_weekly: int | None = None,
+                 max_bytes: int | None = None):
+        """
+        Initialize a RetentionPolicy
+
+        Parameters
+        __________
+        keep_last: int | None
+            Number of most recent versions to keep.
+        keep_daily: int | None
+            Number of days, counted from the newest version, to keep the newest version of.
+        keep_weekly: int | None
+            Number of ISO weeks, counted from the newest version, to keep the newest version of.
+        max_bytes: int | None
+            Maximum total size of the kept versions.
+        """
+        for name, value in (('keep_last', keep_last), ('keep_daily', keep_daily), ('keep_weekly', keep_weekly),
+                            ('max_bytes', max_bytes)):
+            if value is not None and value < 0:
+                raise ValueError(f"{name} must not be negative")
+        self.keep_last = keep_last
+        self.keep_daily = keep_daily
+        self.keep_weekly = keep_weekly
+        self.max_bytes = max_bytes
+
+
+class Version:
+    """
+    Metadata of one ".vc/<n>" directory.
+
+    "parent" is the version a delta version was built on, read from ".vc/<n>.delta.json", and
+    None for a version that holds all of its files.
+    """
+    def __init__(self, number: int, path: str, modified: float, size: int | None, parent: int | None = None):
+        self.number = number
+        self.path = path
+        self.modified = modified
+        self.size = size
+        self.parent = parent
+
+    def __repr__(self):
+        return f"Version(number={self.number}, modified={self.modified}, size={self.size}, parent={self.parent})"
+
+
+class RetentionPlan:
+    """
+    The versions a RetentionPolicy keeps and deletes, newest first.
+    """
+    def __init__(self, keep: list[Version], delete: list[Version]):
+        self.keep = keep
+        self.delete = delete
+
+    @property
+    def bytes_freed(self) -> int:
+        """
+        Get the total size of the versions to delete.
+
+        Returns
+        _______
+        int
+            The apparent size in bytes, 0 for versions that were not sized.
+        """
+        return sum(version.size or 0 for version in self.delete)
+
+
+def _directory_size(path: str) -> int:
+    total = 0
+    pending = [path]
+    while pending:
+        with os.scandir(pending.pop()) as iterator:
+            for entry in iterator:
+                if entry.is_dir(follow_symlinks=False):
+                    pending.append(entry.path)
+                else:
+                    total += entry.stat(follow_symlinks=False).st_size
+    return total
+
+
+def _manifest_path(version_path: str) -> str:
+    return f"{os.path.normpath(version_path)}{DELTA_MANIFEST_SUFFIX}"
+
+
+def _with_parents(numbers: set[int], parents: dict[int, int | None]) -> set[int]:
+    # Follows each version's chain of delta parents until a full version or a missing one
+    closed = set()
+    for number in numbers:
+        while number is not None and number in parents and number not in closed:
+            closed.add(number)
+            number = parents[number]
+    return closed
+
+
+def list_versions(directory_path: str, with_sizes: bool = False, max_workers: int = 8) -> list[Version]:
+    """
+    Lists the versions of a directory from metadata only, newest first.
+
+    Parameters
+    __________
+    directory_path: str
+        The directory whose ".vc" directory is read.
+    with_sizes: bool
+        Whether each version is walked to add up its file sizes.
+    max_workers: int
+        Number of versions sized in parallel.
+
+    Returns
+    _______
+    list[Version]
+        The versions, with sizes set to None unless "with_sizes" is True.
+    """
+    version_control_path = os.path.join(directory_path, VERSION_CONTROL_DIRECTORY_NAME)
+    if not os.path.isdir(version_control_path):
+        return []
+
+    versions = []
+    manifest_names = set()
+    with os.scandir(version_control_path) as iterator:
+        for entry in iterator:
+            if entry.name.isdigit() and entry.is_dir(follow_symlinks=False):
+                versions.append(Version(int(entry.name), entry.path, entry.stat().st_mtime, None))
+            elif entry.name.endswith(DELTA_MANIFEST_SUFFIX):
+                manifest_names.add(entry.name)
+    for version in versions:
+        if f"{version.number}{DELTA_MANIFEST_SUFFIX}" in manifest_names:
+            with open(_manifest_path(version.path)) as manifest_file:
+                version.parent = int(json.load(manifest_file)['parent'])
+    versions.sort(key=lambda version: version.number, reverse=True)
+
+    if with_sizes:
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            for version, size in zip(versions, executor.map(_directory_size, [version.path for version in versions])):
+                version.size = size
+    return versions
+
+
+def plan(versions: list[Version], policy: RetentionPolicy) -> RetentionPlan:
+    """
+    Decides which versions a policy keeps.
+
+    Parameters
+    __________
+    versions: list[Version]
+        The versions, newest first, as returned by "list_versions".
+    policy: RetentionPolicy
+        The policy to apply. Versions must be sized when "max_bytes" is set.
+
+    Returns
+    _______
+    RetentionPlan
+        The versions to keep and delete.
+    """
+    if not versions:
+        return RetentionPlan([], [])
+
+    selectors = [policy.keep_last, policy.keep_daily, policy.keep_weekly]
+    if all(selector is None for selector in selectors):
+        selected = {version.number for version in versions}
+    else:
+        selected = {version.number for version in versions[:policy.keep_last or 0]}
+        for count, bucket in ((policy.keep_daily, lambda day: day),
+                              (policy.keep_weekly, lambda day: day.isocalendar()[:2])):
+            if not count:
+                continue
+            seen = []
+            for version in versions:
+                key = bucket(datetime.date.fromtimestamp(version.modified))
+                if key not in seen:
+                    if len(seen) == count:
+                        break
+                    seen.append(key)
+                    selected.add(version.number)
+    selected.add(versions[0].number)
+
+    parents = {version.number: version.parent for version in versions}
+    kept = _with_parents(selected, parents)
+    if policy.max_bytes is not None:
+        if any(version.size is None for version in versions):
+            raise ValueError("versions must be sized to apply max_bytes")
+        sizes = {version.number: version.size for version in versions}
+        total = sum(sizes[number] for number in kept)
+        for version in reversed(versions[1:]):
+            if total <= policy.max_bytes:
+                break
+            if version.number in selected:
+                # Dropping a version only frees the parents no other kept version was built on
+                selected.discard(version.number)
+                kept = _with_parents(selected, parents)
+                total = sum(sizes[number] for number in kept)
+
+    return RetentionPlan([version for version in versions if version.number in kept],
+                         [version for version in versions if version.number not in kept])
+
+
+def _clear_directory(path: str) -> list[str]:
+    subdirectories = []
+    with os.scandir(path) as iterator:
+        for entry in iterator:
+            if entry.is_dir(follow_symlinks=False):
+                subdirectories.append(entry.path)
+            else:
+                os.unlink(entry.path)
+    return subdirectories
+
+
+def delete_trees(paths: list[str], max_workers: int = 8):
+    """
+    Deletes directory trees with at most "max_workers" file system calls in flight.
+
+    Each level of the trees is cleared in parallel, one directory per task, and the emptied
+    directories are then removed from the deepest level up.
+
+    Parameters
+    __________
+    paths: list[str]
+        The directories to delete.
+    max_workers: int
+        Maximum number of concurrent directory operations.
+    """
+    levels = [list(paths)]
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        while levels[-1]:
+            levels.append([subdirectory for subdirectories in executor.map(_clear_directory, levels[-1])
+                           for subdirectory in subdirectories])
+        for level in reversed(levels[:-1]):
+            list(executor.map(os.rmdir, level))
+
+
+def _doomed_path(version: Version) -> str:
+    doomed_path = os.path.join(os.path.dirname(version.path), f"{DELETING_PREFIX}{version.number}")
+    suffix = 1
+    while os.path.lexists(doomed_path):
+        doomed_path = os.path.join(os.path.dirname(version.path), f"{DELETING_PREFIX}{version.number}-{suffix}")
+        suffix += 1
+    return doomed_path
+
+
+def list_leftovers(version_control_path: str) -> list[str]:
+    """
+    Lists the ".vc/.deleting-*" directories left behind by interrupted prunes.
+
+    Parameters
+    __________
+    version_control_path: str
+        The ".vc" directory to look in.
+
+    Returns
+    _______
+    list[str]
+        The paths of the leftover directories.
+    """
+    if not os.path.isdir(version_control_path):
+        return []
+    with os.scandir(version_control_path) as iterator:
+        return [entry.path for entry in iterator
+                if entry.name.startswith(DELETING_PREFIX) and entry.is_dir(follow_symlinks=False)]
+
+
+def _orphaned_manifests(version_control_path: str) -> list[str]:
+    with os.scandir(version_control_path) as iterator:
+        names = {entry.name for entry in iterator}
+    return [os.path.join(version_control_path, name) for name in names
+            if name.endswith(DELTA_MANIFEST_SUFFIX) and name[:-len(DELTA_MANIFEST_SUFFIX)] not in names]
+
+
+def prune(retention_plan: RetentionPlan, max_workers: int = 8) -> list[int]:
+    """
+    Deletes the versions a plan does not keep.
+
+    Each version is first renamed to ".vc/.deleting-<n>", so an interrupted prune never leaves a
+    partially deleted directory that looks like a version, and its ".vc/<n>.delta.json" is then
+    removed. Directories left with that prefix and manifests left without their version by an
+    earlier interrupted prune are deleted along with them.
+
+    Parameters
+    __________
+    retention_plan: RetentionPlan
+        The plan returned by "plan".
+    max_workers: int
+        Maximum number of concurrent directory operations.
+
+    Returns
+    _______
+    list[int]
+        The numbers of the deleted versions.
+    """
+    version_control_paths = {os.path.dirname(version.path) for version in retention_plan.keep + retention_plan.delete}
+    for version in retention_plan.delete:
+        os.rename(version.path, _doomed_path(version))
+    for version_control_path in sorted(version_control_paths):
+        for manifest_path in _orphaned_manifests(version_control_path):
+            os.unlink(manifest_path)
+    delete_trees([leftover for version_control_path in sorted(version_control_paths)
+                  for leftover in list_leftovers(version_control_path)], max_workers)
+    return [version.number for version in retention_plan.delete]
+
+
+def verify(versions: list[Version]) -> dict[int, int]:
+    """
+    Restores each version into an empty directory through RestoreService.
+
+    Parameters
+    __________
+    versions: list[Version]
+        The versions to check, usually the kept versions of a plan.
+
+    Returns
+    _______
+    dict[int, int]
+        The restore status code of each version number. 201 means the version restored, 409 that
+        it holds no files.
+
+    Raises
+    ______
+    requests.RequestException
+        If the HTTP request encounters an error.
+    """
+    statuses = {}
+    for version in versions:
+        with tempfile.TemporaryDirectory() as destination_path:
+            data = json.dumps({'vcPath': version.path, 'destinationPath': destination_path})
+            statuses[version.number] = RestoreService.restore(data).status_code
+    return statuses
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Delete old versions from a directory's .vc directory")
+    parser.add_argument('directory', help="directory whose versions are pruned")
+    parser.add_argument('--keep-last', type=int, help="number of most recent versions to keep")
+    parser.add_argument('--keep-daily', type=int, help="number of days to keep the newest version of")
+    parser.add_argument('--keep-weekly', type=int, help="number of weeks to keep the newest version of")
+    parser.add_argument('--max-bytes', type=int, help="maximum total size of the kept versions")
+    parser.add_argument('--workers', type=int, default=8, help="maximum concurrent file system operations")
+    parser.add_argument('--apply', action='store_true', help="delete the versions instead of listing them")
+    parser.add_argument('--verify', action='store_true', help="restore every kept version after deleting")
+    arguments = parser.parse_args()
+
+    policy = RetentionPolicy(arguments.keep_last, arguments.keep_daily, arguments.keep_weekly, arguments.max_bytes)
+    versions = list_versions(arguments.directory, with_sizes=policy.max_bytes is not None,
+                             max_workers=arguments.workers)
+    retention_plan = plan(versions, policy)
+    print(f"keep: {[version.number for version in retention_plan.keep]}")
+    print(f"delete: {[version.number for version in retention_plan.delete]}")
+    if not arguments.apply:
+        return
+
+    prune(retention_plan, arguments.workers)
+    if arguments.verify:
+        statuses = verify(retention_plan.keep)
+        print(f"verify: {statuses}")
+        if any(status not in (HTTPStatus.CREATED.value, HTTPStatus.CONFLICT.value) for status in statuses.values()):
+            raise SystemExit(1)
+
+
+if __name__ == '__main__':
+    main()
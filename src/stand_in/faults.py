@@ -0,0 +1,74 @@
+import random
+import threading
+
+
+class FaultProfile:
+    """
+    Faults a StandInServer injects into its responses.
+
+    Delays are either a fixed number of seconds or a function of the profile's random number
+    generator and the number of requests in flight, such as "lambda rng, in_flight:
+    rng.expovariate(10)", which can also model a server whose capacity depends on its load.
+    A seed makes the sequence of injected faults repeatable.
+    """
+    def __init__(self, delay=0.0, endpoint_delays: dict | None = None, error_rate: float = 0.0,
+                 drop_rate: float = 0.0, chunk_delay: float = 0.0, chunk_size: int = 16, seed: int | None = None):
+        """
+        Initialize a FaultProfile
+
+        Parameters
+        __________
+        delay: float | Callable[[random.Random, int], float]
+            Delay before every response.
+        endpoint_delays: dict | None
+            Delays by request path, such as {"/api/v1/restore": 0.5}, used instead of "delay".
+        error_rate: float
+            Probability of answering with a 500 without handling the request.
+        drop_rate: float
+            Probability of closing the connection without answering.
+        chunk_delay: float
+            Seconds to wait between chunks of the response body.
+        chunk_size: int
+            Number of bytes in each chunk of the response body when "chunk_delay" is set.
+        seed: int | None
+            Seed of the random number generator.
+        """
+        for name, rate in (('error_rate', error_rate), ('drop_rate', drop_rate)):
+            if not 0 <= rate <= 1:
+                raise ValueError(f"{name} must be between 0 and 1")
+        if chunk_size < 1:
+            raise ValueError("chunk_size must be at least 1")
+        self.delay = delay
+        self.endpoint_delays = dict(endpoint_delays or {})
+        self.error_rate = error_rate
+        self.drop_rate = drop_rate
+        self.chunk_delay = chunk_delay
+        self.chunk_size = chunk_size
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def draw(self, path: str, in_flight: int = 1) -> tuple[str | None, float]:
+        """
+        Decide the fault injected into one request.
+
+        Parameters
+        __________
+        path: str
+            The request path.
+        in_flight: int
+            The number of requests the server is handling, including this one.
+
+        Returns
+        _______
+        tuple[str | None, float]
+            "drop", "error" or None, and the delay in seconds before responding.
+        """
+        with self._lock:
+            delay = self.endpoint_delays.get(path, self.delay)
+            delay = delay(self._random, in_flight) if callable(delay) else delay
+            roll = self._random.random()
+        if roll < self.drop_rate:
+            return 'drop', max(delay, 0.0)
+        if roll < self.drop_rate + self.error_rate:
+            return 'error', max(delay, 0.0)
+        return None, max(delay, 0.0)
@@ -0,0 +1,447 @@
+import filecmp
+import json
+import os
+import shutil
+import threading
+import time
+from collections import Counter
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from src.stand_in.faults import FaultProfile
+
+VERSION_CONTROL_DIRECTORY_NAME = '.vc'
+DELTA_MANIFEST_SUFFIX = '.delta.json'
+
+
+def _walk_files(directory_path: str) -> list[str]:
+    """
+    Lists the relative paths of every file under a directory, skipping ".vc" directories.
+    """
+    relative_paths = []
+    for root, directories, files in os.walk(directory_path):
+        directories[:] = [name for name in directories if name != VERSION_CONTROL_DIRECTORY_NAME]
+        for name in files:
+            relative_paths.append(os.path.relpath(os.path.join(root, name), directory_path))
+    return relative_paths
+
+
+def _latest_version(version_control_path: str) -> int:
+    if not os.path.isdir(version_control_path):
+        return 0
+    versions = [int(name) for name in os.listdir(version_control_path) if name.isdigit()]
+    return max(versions, default=0)
+
+
+def _is_inside(directory_path: str, relative_path: str) -> bool:
+    if os.path.isabs(relative_path):
+        return False
+    resolved = os.path.normpath(os.path.join(directory_path, relative_path))
+    return os.path.commonpath([resolved, os.path.normpath(directory_path)]) == os.path.normpath(directory_path)
+
+
+def _copy_file(source: str, destination: str):
+    os.makedirs(os.path.dirname(destination), exist_ok=True)
+    shutil.copy2(source, destination)
+
+
+def _manifest_path(version_path: str) -> str:
+    return f"{os.path.normpath(version_path)}{DELTA_MANIFEST_SUFFIX}"
+
+
+def _is_valid_delta(delta) -> bool:
+    if not isinstance(delta, dict):
+        return False
+    for key in ('changed', 'added', 'removed'):
+        paths = delta.get(key, [])
+        if not isinstance(paths, list) or not all(isinstance(path, str) for path in paths):
+            return False
+    renamed = delta.get('renamed', [])
+    return isinstance(renamed, list) and all(
+        isinstance(entry, dict) and isinstance(entry.get('from'), str) and isinstance(entry.get('to'), str)
+        for entry in renamed)
+
+
+def version_files(version_path: str) -> dict[str, str] | None:
+    """
+    Resolves the files of a version, following the parents of delta versions.
+
+    Parameters
+    __________
+    version_path: str
+        A ".vc/<n>" directory.
+
+    Returns
+    _______
+    dict[str, str] | None
+        The location of each file of the version by its relative path, or None if a parent
+        version the delta versions depend on is missing.
+    """
+    files = {}
+    removed = set()
+    current = os.path.normpath(version_path)
+    while True:
+        if not os.path.isdir(current):
+            return None
+        for relative_path in _walk_files(current):
+            relative_path = os.path.normpath(relative_path)
+            if relative_path not in files and relative_path not in removed:
+                files[relative_path] = os.path.join(current, relative_path)
+        manifest_path = _manifest_path(current)
+        if not os.path.isfile(manifest_path):
+            return files
+        with open(manifest_path) as manifest_file:
+            manifest = json.load(manifest_file)
+        removed.update(os.path.normpath(path) for path in manifest['removed'])
+        current = os.path.join(os.path.dirname(current), str(manifest['parent']))
+
+
+class StandInServer:
+    """
+    Local stand-in for the FileVersionControl API.
+
+    Serves the commit and restore endpoints on 127.0.0.1 with the same request bodies,
+    status codes and messages as the FileVersionControl project, so the services can be
+    exercised without it. Commits also accept a "delta" object listing the changed, added,
+    renamed and removed paths. A delta commit only copies the written paths into ".vc/<n>" and
+    records the removed paths and the parent version in ".vc/<n>.delta.json", so its cost
+    follows the size of the delta; restores resolve the files through the chain of parents.
+    A delta version therefore depends on every version it was built on.
+
+    The number of file contents read and written is counted in "stats". "faults" is a
+    FaultProfile of delays, slow response bodies, dropped connections and 500s injected into
+    every request.
+    """
+    def __init__(self, host: str = '127.0.0.1', port: int = 0):
+        """
+        Initialize a StandInServer
+
+        Parameters
+        __________
+        host: str
+            Address the server binds to.
+        port: int
+            Port the server binds to, 0 picks a free port.
+        """
+        self.stats = Counter()
+        self.faults = FaultProfile()
+        self._stats_lock = threading.Lock()
+        self._in_flight = 0
+        self._directory_locks = {}
+        self._directory_locks_lock = threading.Lock()
+        self._httpd = ThreadingHTTPServer((host, port), self._make_handler())
+        self._httpd.daemon_threads = True
+        self._thread = None
+
+    @property
+    def base_url(self) -> str:
+        """
+        Get the base URL of the server.
+
+        Returns
+        _______
+        str
+            The URL the API endpoints are served under, without a trailing slash.
+        """
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        """
+        Start serving requests on a background thread.
+        """
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """
+        Stop serving requests and close the socket.
+        """
+        self._httpd.shutdown()
+        self._httpd.server_close()
+        if self._thread is not None:
+            self._thread.join()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+    def count(self, name: str, amount: int = 1):
+        with self._stats_lock:
+            self.stats[name] += amount
+
+    def _enter(self) -> int:
+        with self._stats_lock:
+            self._in_flight += 1
+            self.stats['peak_in_flight'] = max(self.stats['peak_in_flight'], self._in_flight)
+            return self._in_flight
+
+    def _exit(self):
+        with self._stats_lock:
+            self._in_flight -= 1
+
+    def handle(self, path: str, body: dict) -> tuple[int, list[str], str]:
+        """
+        Dispatches a request body to the matching endpoint.
+
+        Parameters
+        __________
+        path: str
+            The request path.
+        body: dict
+            The decoded JSON request body.
+
+        Returns
+        _______
+        tuple[int, list[str], str]
+            The status code, results and message of the response.
+        """
+        if path == '/api/v1/commit':
+            self.count('commits')
+            with self._lock_for(str(body.get('directoryPath', ''))):
+                if body.get('delta') is not None:
+                    return self.commit_delta(str(body.get('directoryPath', '')), body['delta'])
+                return self.commit(str(body.get('directoryPath', '')))
+        if path == '/api/v1/restore':
+            self.count('restores')
+            return self.restore(str(body.get('vcPath', '')), str(body.get('destinationPath', '')))
+        return HTTPStatus.NOT_FOUND.value, [f"{path} is not an endpoint"], "The requested endpoint does not exist"
+
+    def commit(self, directory_path: str) -> tuple[int, list[str], str]:
+        """
+        Commits every file of a directory as a new full version.
+
+        Parameters
+        __________
+        directory_path: str
+            The directory being committed.
+
+        Returns
+        _______
+        tuple[int, list[str], str]
+            The status code, results and message of the response.
+        """
+        if not os.path.isdir(directory_path):
+            return (HTTPStatus.BAD_REQUEST.value, [f"{directory_path} is not a directory"],
+                    "The requested directory is not valid")
+
+        version_control_path = os.path.join(directory_path, VERSION_CONTROL_DIRECTORY_NAME)
+        latest_version = _latest_version(version_control_path)
+        relative_paths = _walk_files(directory_path)
+
+        if latest_version and self._is_up_to_date(directory_path, os.path.join(version_control_path,
+                                                                               str(latest_version)), relative_paths):
+            return (HTTPStatus.CONFLICT.value, [f"{directory_path} is up to date"],
+                    "The requested directory is up to date")
+
+        version_path = os.path.join(version_control_path, str(latest_version + 1))
+        os.makedirs(version_path)
+        results = []
+        all_committed = True
+        for relative_path in relative_paths:
+            self.count('files_read')
+            self.count('files_written')
+            try:
+                _copy_file(os.path.join(directory_path, relative_path), os.path.join(version_path, relative_path))
+                results.append(f"{os.path.basename(relative_path)} has been committed\n")
+            except OSError:
+                all_committed = False
+                results.append(f"{os.path.basename(relative_path)} has not been committed\n")
+
+        if not all_committed:
+            return HTTPStatus.INTERNAL_SERVER_ERROR.value, results, "Not all files have been committed"
+        return HTTPStatus.CREATED.value, results, "All files have been committed"
+
+    def commit_delta(self, directory_path: str, delta: dict) -> tuple[int, list[str], str]:
+        """
+        Commits only the paths listed in a delta as a new version on top of the latest one.
+
+        Parameters
+        __________
+        directory_path: str
+            The directory being committed.
+        delta: dict
+            The "changed", "added", "renamed" and "removed" paths, relative to the directory.
+
+        Returns
+        _______
+        tuple[int, list[str], str]
+            The status code, results and message of the response.
+        """
+        if not _is_valid_delta(delta):
+            return (HTTPStatus.BAD_REQUEST.value, ["The delta must list paths under changed, added and removed and "
+                                                   "from/to pairs under renamed"], "The requested delta is not valid")
+        if not os.path.isdir(directory_path):
+            return (HTTPStatus.BAD_REQUEST.value, [f"{directory_path} is not a directory"],
+                    "The requested directory is not valid")
+
+        version_control_path = os.path.join(directory_path, VERSION_CONTROL_DIRECTORY_NAME)
+        latest_version = _latest_version(version_control_path)
+        if not latest_version:
+            # Without a previous version there is nothing to apply the delta to
+            return self.commit(directory_path)
+
+        renamed = [(entry['from'], entry['to']) for entry in delta.get('renamed', [])]
+        written = list(delta.get('changed', [])) + list(delta.get('added', [])) + [target for _, target in renamed]
+        dropped = set(delta.get('removed', [])) | {source for source, _ in renamed}
+
+        invalid = [path for path in written + list(dropped) if not _is_inside(directory_path, path)]
+        invalid += [path for path in written
+                    if path not in invalid and not os.path.isfile(os.path.join(directory_path, path))]
+        if invalid:
+            return (HTTPStatus.BAD_REQUEST.value, [f"{path} is not a file" for path in invalid],
+                    "The requested delta is not valid")
+        if not written and not dropped:
+            return (HTTPStatus.CONFLICT.value, [f"{directory_path} is up to date"],
+                    "The requested directory is up to date")
+
+        version_path = os.path.join(version_control_path, str(latest_version + 1))
+        os.makedirs(version_path)
+        with open(_manifest_path(version_path), 'w') as manifest_file:
+            json.dump({'parent': latest_version, 'removed': sorted(dropped)}, manifest_file)
+
+        results = []
+        all_committed = True
+        for relative_path in written:
+            self.count('files_read')
+            self.count('files_written')
+            try:
+                _copy_file(os.path.join(directory_path, relative_path), os.path.join(version_path, relative_path))
+                results.append(f"{os.path.basename(relative_path)} has been committed\n")
+            except OSError:
+                all_committed = False
+                results.append(f"{os.path.basename(relative_path)} has not been committed\n")
+        results += [f"{os.path.basename(path)} has been removed\n" for path in sorted(dropped)]
+
+        if not all_committed:
+            return HTTPStatus.INTERNAL_SERVER_ERROR.value, results, "Not all files have been committed"
+        return HTTPStatus.CREATED.value, results, "All files have been committed"
+
+    def restore(self, vc_path: str, destination_path: str) -> tuple[int, list[str], str]:
+        """
+        Restores the files of a version into a destination directory.
+
+        Parameters
+        __________
+        vc_path: str
+            The ".vc/<n>" directory being restored.
+        destination_path: str
+            The directory the files are restored into.
+
+        Returns
+        _______
+        tuple[int, list[str], str]
+            The status code, results and message of the response.
+        """
+        is_valid_vc = os.path.basename(os.path.dirname(os.path.normpath(vc_path))) == VERSION_CONTROL_DIRECTORY_NAME
+        files = version_files(vc_path) if is_valid_vc else None
+        is_valid_vc = files is not None
+        is_valid_destination = os.path.isdir(destination_path)
+        if not is_valid_vc and not is_valid_destination:
+            return (HTTPStatus.BAD_REQUEST.value,
+                    [f"{vc_path} is not a valid version control directory and {destination_path} is not a directory"],
+                    "The version control directory and the destination directory are not valid")
+        if not is_valid_vc:
+            return (HTTPStatus.BAD_REQUEST.value, [f"{vc_path} is not a valid version control directory"],
+                    "The version control directory is not valid")
+        if not is_valid_destination:
+            return (HTTPStatus.BAD_REQUEST.value, [f"{destination_path} is not a directory"],
+                    "The destination directory is not valid")
+
+        results = []
+        restored = 0
+        all_restored = True
+        for relative_path, source in files.items():
+            name = os.path.basename(relative_path)
+            destination = os.path.join(destination_path, relative_path)
+            self.count('files_read')
+            try:
+                if os.path.isfile(destination) and filecmp.cmp(source, destination, shallow=False):
+                    results.append(f"{name} is already up to date\n")
+                    continue
+                _copy_file(source, destination)
+                restored += 1
+                results.append(f"{name} has been restored\n")
+            except OSError:
+                all_restored = False
+                results.append(f"{name} has not been restored\n")
+
+        if not all_restored:
+            return HTTPStatus.INTERNAL_SERVER_ERROR.value, results, "Not all files have been restored"
+        if not restored:
+            return (HTTPStatus.CONFLICT.value, results,
+                    "The requested destination directory is up to date with the version control directory")
+        return HTTPStatus.CREATED.value, results, "All changed files have been restored"
+
+    def _is_up_to_date(self, directory_path: str, version_path: str, relative_paths: list[str]) -> bool:
+        files = version_files(version_path)
+        if files is None or sorted(map(os.path.normpath, relative_paths)) != sorted(files):
+            return False
+        for relative_path in relative_paths:
+            self.count('files_read')
+            if not filecmp.cmp(os.path.join(directory_path, relative_path), files[os.path.normpath(relative_path)],
+                               shallow=False):
+                return False
+        return True
+
+    def _lock_for(self, directory_path: str) -> threading.Lock:
+        # Commits to the same directory are serialized so version numbers are not handed out twice
+        with self._directory_locks_lock:
+            return self._directory_locks.setdefault(os.path.normpath(directory_path), threading.Lock())
+
+    def _make_handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                length = int(self.headers.get('Content-Length', 0))
+                try:
+                    body = json.loads(self.rfile.read(length) or b'{}')
+                except ValueError:
+                    body = None
+                faults = server.faults
+                in_flight = server._enter()
+                try:
+                    fault, fault_delay = faults.draw(self.path, in_flight)
+                    if fault_delay > 0:
+                        time.sleep(fault_delay)
+                    if fault == 'drop':
+                        server.count('dropped_connections')
+                        self.close_connection = True
+                        return
+                    if fault == 'error':
+                        server.count('injected_errors')
+                        status, results, message = (HTTPStatus.INTERNAL_SERVER_ERROR.value, [],
+                                                    "An error was injected by the stand-in server")
+                    elif not isinstance(body, dict):
+                        status, results, message = (HTTPStatus.BAD_REQUEST.value,
+                                                    ["The request body is not valid JSON"], "The request is not valid")
+                    else:
+                        status, results, message = server.handle(self.path, body)
+                finally:
+                    server._exit()
+                payload = json.dumps({'status': status, 'results': results, 'message': message}).encode()
+                try:
+                    self.send_response(status)
+                    self.send_header('Content-Type', 'application/json')
+                    self.send_header('Content-Length', str(len(payload)))
+                    self.end_headers()
+                    if faults.chunk_delay <= 0:
+                        self.wfile.write(payload)
+                        return
+                    # Streams the body slowly so each read succeeds but the whole response is late
+                    for start in range(0, len(payload), faults.chunk_size):
+                        self.wfile.write(payload[start:start + faults.chunk_size])
+                        self.wfile.flush()
+                        time.sleep(faults.chunk_delay)
+                except ConnectionError:
+                    # The client gave up waiting, which is what the faults are there to provoke
+                    self.close_connection = True
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler